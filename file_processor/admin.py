@@ -9,7 +9,7 @@ class ConvertedImageInline(admin.TabularInline):
 class AnalysisResultInline(admin.TabularInline):
     model = AnalysisResult
     extra = 0
-    readonly_fields = ('image', 'result_data', 'created_at')
+    readonly_fields = ('image', 'provider', 'result_data', 'created_at')
 
 @admin.register(PDFConversion)
 class PDFConversionAdmin(admin.ModelAdmin):
@@ -25,13 +25,13 @@ class ConvertedImageAdmin(admin.ModelAdmin):
 
 @admin.register(ImageAnalysis)
 class ImageAnalysisAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'user', 'status', 'created_at')
-    list_filter = ('status', 'created_at', 'user')
+    list_display = ('__str__', 'user', 'analysis_type', 'status', 'created_at')
+    list_filter = ('analysis_type', 'status', 'created_at', 'user')
     readonly_fields = ('status', 'created_at')
     inlines = [AnalysisResultInline]
 
 @admin.register(AnalysisResult)
 class AnalysisResultAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'analysis', 'created_at')
-    list_filter = ('created_at', 'analysis__user')
+    list_display = ('__str__', 'analysis', 'provider', 'created_at')
+    list_filter = ('provider', 'created_at', 'analysis__user')
     readonly_fields = ('result_data', 'created_at')
@@ -42,6 +42,7 @@ class ImageSelectionForm(forms.Form):
         choices=[
             ('dify', 'Dify API (Structured Analysis)'),
             ('zhipu', 'ZHIPU Vision (AI Vision Model)'),
+            ('auto', 'Auto (Fastest Healthy Provider, with Failover)'),
         ],
         initial='dify',
         widget=forms.RadioSelect(attrs={'class': 'mr-2'}),
@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from PIL import Image
+
+MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+}
+
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+    'PNG': '.png',
+}
+
+# Marks a source whose converted variant was not smaller, so the original is sent as is
+KEEP_ORIGINAL_SUFFIX = '.original'
+CLEANUP_STAMP = '.last_cleanup'
+
+
+def clean_cache(cache_dir, max_age_days=None, max_mb=None):
+    """Remove cache entries unused for max_age_days, then the least recently used ones
+    until the directory is under max_mb. Returns (files removed, bytes freed)."""
+    max_age_days = settings.AI_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_mb = settings.AI_CACHE_MAX_MB if max_mb is None else max_mb
+    if not os.path.isdir(cache_dir):
+        return 0, 0
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name != CLEANUP_STAMP:
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()  # least recently used first
+
+    cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+    total = sum(size for _, size, _ in entries)
+    removed = freed = 0
+    for mtime, size, path in entries:
+        expired = cutoff is not None and mtime < cutoff
+        if not expired and (not max_mb or total <= max_mb * 1024 * 1024):
+            break  # the rest are newer and the directory is small enough
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue  # removed by another worker
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+@dataclass
+class PreparedImage:
+    """An image ready to be sent to an AI provider"""
+    path: str
+    mime: str
+    original_bytes: int
+    sent_bytes: int
+    cache_hit: bool = False
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+
+class ImagePreprocessor:
+    """Downscale and recompress page images before they are uploaded.
+
+    Rendered PDF pages are 2x PNGs and usually several MB; the vision models
+    don't need that much. Variants are cached on disk, keyed by the source
+    content hash plus the preprocessing options; a source that does not get
+    smaller is remembered with an empty marker file so it is not converted
+    again. Hits refresh an entry's mtime, and the cache is trimmed by
+    clean_cache() at most every AI_CACHE_CLEANUP_INTERVAL seconds.
+    """
+
+    def __init__(self, max_edge=None, grayscale=None, image_format=None, quality=None,
+                 enabled=None, cache_dir=None):
+        self.enabled = settings.AI_IMAGE_PREPROCESS if enabled is None else enabled
+        self.max_edge = max_edge or settings.AI_IMAGE_MAX_EDGE
+        self.grayscale = settings.AI_IMAGE_GRAYSCALE if grayscale is None else grayscale
+        self.image_format = (image_format or settings.AI_IMAGE_FORMAT).upper()
+        self.quality = quality or settings.AI_IMAGE_QUALITY
+        self.cache_dir = cache_dir or os.path.join(settings.MEDIA_ROOT, 'ai_cache')
+        if self.image_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unsupported image format: {self.image_format}")
+
+    def _cache_key(self, data):
+        options = f"{self.max_edge}|{self.grayscale}|{self.image_format}|{self.quality}"
+        digest = hashlib.sha256(data)
+        digest.update(options.encode())
+        return digest.hexdigest()
+
+    def _hit(self, path):
+        os.utime(path)  # keeps used entries out of the age/size cleanup
+        return path
+
+    def _store(self, path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._maybe_clean()
+
+    def _maybe_clean(self):
+        stamp = os.path.join(self.cache_dir, CLEANUP_STAMP)
+        try:
+            if time.time() - os.path.getmtime(stamp) < settings.AI_CACHE_CLEANUP_INTERVAL:
+                return
+        except FileNotFoundError:
+            pass
+        open(stamp, 'a').close()
+        os.utime(stamp)  # claim this round before the scan, so other workers skip it
+        clean_cache(self.cache_dir)
+
+    def _convert(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            if self.grayscale:
+                img = img.convert('L')
+            elif img.mode not in ('RGB', 'L'):
+                # JPEG has no alpha channel; flatten onto white like a printed page
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                rgba = img.convert('RGBA')
+                background.paste(rgba, mask=rgba.split()[-1])
+                img = background
+            if max(img.size) > self.max_edge:
+                img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+
+            out = io.BytesIO()
+            save_kwargs = {'optimize': True}
+            if self.image_format in ('JPEG', 'WEBP'):
+                save_kwargs['quality'] = self.quality
+            img.save(out, format=self.image_format, **save_kwargs)
+            return out.getvalue()
+
+    def prepare(self, image_path):
+        """Return a PreparedImage for image_path, converting it if enabled"""
+        original_bytes = os.path.getsize(image_path)
+        ext = os.path.splitext(image_path)[-1].lower()
+        if not self.enabled:
+            return PreparedImage(image_path, MIME_TYPES.get(ext, 'image/png'),
+                                 original_bytes, original_bytes)
+
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        out_ext = FORMAT_EXTENSIONS[self.image_format]
+        key = self._cache_key(data)
+        cached_path = os.path.join(self.cache_dir, key + out_ext)
+        keep_path = os.path.join(self.cache_dir, key + KEEP_ORIGINAL_SUFFIX)
+        try:
+            return PreparedImage(self._hit(cached_path), MIME_TYPES[out_ext], original_bytes,
+                                 os.path.getsize(cached_path), cache_hit=True)
+        except FileNotFoundError:
+            pass
+        try:
+            self._hit(keep_path)
+            return PreparedImage(image_path, MIME_TYPES.get(ext, 'image/png'),
+                                 original_bytes, original_bytes, cache_hit=True)
+        except FileNotFoundError:
+            pass
+
+        converted = self._convert(data)
+        if len(converted) >= original_bytes:
+            # Already small enough; recompressing would only cost quality
+            self._store(keep_path, b'')
+            return PreparedImage(image_path, MIME_TYPES.get(ext, 'image/png'),
+                                 original_bytes, original_bytes)
+
+        self._store(cached_path, converted)
+        return PreparedImage(cached_path, MIME_TYPES[out_ext], original_bytes, len(converted))
@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from file_processor.image_preprocess import ImagePreprocessor
+from file_processor.models import ConvertedImage
+
+
+class TimedPreprocessor:
+    """ImagePreprocessor wrapper that remembers the last prepare() result and how long it took"""
+
+    def __init__(self, preprocessor):
+        self.preprocessor = preprocessor
+        self.prepared = None
+        self.seconds = 0.0
+
+    def prepare(self, image_path):
+        started = time.monotonic()
+        self.prepared = self.preprocessor.prepare(image_path)
+        self.seconds = time.monotonic() - started
+        return self.prepared
+
+
+class Command(BaseCommand):
+    help = 'Compare AI upload payload size and latency with and without image preprocessing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Image files (default: latest converted pages)')
+        parser.add_argument('--limit', type=int, default=5, help='Number of converted pages to use')
+        parser.add_argument('--provider', choices=['none', 'dify', 'zhipu'], default='none',
+                            help='Also send each variant to this provider and time it')
+        parser.add_argument('--max-edge', type=int)
+        parser.add_argument('--format', dest='image_format')
+        parser.add_argument('--quality', type=int)
+        parser.add_argument('--grayscale', action='store_true')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [
+            image.image_file.path
+            for image in ConvertedImage.objects.order_by('-created_at')[:options['limit']]
+        ]
+        if not paths:
+            raise CommandError('No images given and no converted pages in the database.')
+
+        variants = {
+            'original': ImagePreprocessor(enabled=False),
+            'preprocessed': ImagePreprocessor(
+                enabled=True,
+                max_edge=options['max_edge'],
+                image_format=options['image_format'],
+                quality=options['quality'],
+                grayscale=options['grayscale'] or None,
+            ),
+        }
+
+        for name, preprocessor in variants.items():
+            sizes, prep_times, e2e_times = [], [], []
+            for path in paths:
+                timed = TimedPreprocessor(preprocessor)
+                started = time.monotonic()
+                if options['provider'] != 'none':
+                    # The upload path preprocesses the original file itself, once
+                    self._send(options['provider'], timed, path)
+                    e2e_times.append(time.monotonic() - started)
+                else:
+                    timed.prepare(path)
+                prep_times.append(timed.seconds)
+                sizes.append(timed.prepared.sent_bytes)
+
+            line = (f"{name:>12}: avg payload {statistics.mean(sizes) / 1024:8.1f} KB, "
+                    f"avg prep {statistics.mean(prep_times) * 1000:7.1f} ms")
+            if e2e_times:
+                line += (f", e2e p50 {statistics.median(e2e_times) * 1000:8.1f} ms, "
+                         f"max {max(e2e_times) * 1000:8.1f} ms")
+            self.stdout.write(line)
+
+    def _send(self, provider, preprocessor, path):
+        if provider == 'dify':
+            from file_processor.services import DifyAPIService
+            service = DifyAPIService()
+            service.preprocessor = preprocessor
+            service.run_workflow(service.upload_image(path))
+        else:
+            from file_processor.zhipu_service import ZhipuVisionService
+            service = ZhipuVisionService()
+            service.preprocessor = preprocessor
+            service.analyze_single_image(path)
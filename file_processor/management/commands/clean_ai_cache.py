@@ -0,0 +1,20 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from file_processor.image_preprocess import clean_cache
+
+
+class Command(BaseCommand):
+    help = ('Trim MEDIA_ROOT/ai_cache: remove preprocessed images unused for --max-age-days, then the '
+            'least recently used ones until it is under --max-mb (defaults: AI_CACHE_MAX_AGE_DAYS, AI_CACHE_MAX_MB)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=float)
+        parser.add_argument('--max-mb', type=float)
+
+    def handle(self, *args, **options):
+        cache_dir = os.path.join(settings.MEDIA_ROOT, 'ai_cache')
+        removed, freed = clean_cache(cache_dir, options['max_age_days'], options['max_mb'])
+        self.stdout.write(f"Removed {removed} files ({freed / 1024 / 1024:.1f} MB) from {cache_dir}")
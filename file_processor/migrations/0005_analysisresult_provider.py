@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_processor', '0004_merge_0003_add_analysis_type_0003_merge_20251122_1014'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='provider',
+            field=models.CharField(blank=True, choices=[('dify', 'Dify API'), ('zhipu', 'ZHIPU Vision')], help_text='Provider that produced this result', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='imageanalysis',
+            name='analysis_type',
+            field=models.CharField(choices=[('dify', 'Dify API'), ('zhipu', 'ZHIPU Vision'), ('auto', 'Auto (fastest provider)')], default='dify', max_length=20),
+        ),
+    ]
@@ -53,6 +53,7 @@ class ImageAnalysis(models.Model):
     analysis_type = models.CharField(max_length=20, default='dify', choices=[
         ('dify', 'Dify API'),
         ('zhipu', 'ZHIPU Vision'),
+        ('auto', 'Auto (fastest provider)'),
     ])
     
     def __str__(self):
@@ -65,6 +66,10 @@ class AnalysisResult(models.Model):
     analysis = models.ForeignKey(ImageAnalysis, on_delete=models.CASCADE, related_name='results')
     image = models.ForeignKey(ConvertedImage, on_delete=models.CASCADE)
     result_data = models.JSONField(default=dict, help_text='Dify API response data')
+    provider = models.CharField(max_length=20, blank=True, choices=[
+        ('dify', 'Dify API'),
+        ('zhipu', 'ZHIPU Vision'),
+    ], help_text='Provider that produced this result')
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -0,0 +1,133 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .resilience import get_stats
+
+
+class TokenBucket:
+    """Token bucket whose state lives in a locked file.
+
+    Every gunicorn worker and background thread that opens the same bucket
+    name shares one budget, because refills and withdrawals happen under an
+    exclusive flock on the state file.
+    """
+
+    def __init__(self, name, rate, capacity, state_dir=None):
+        self.rate = float(rate)  # tokens added per second
+        self.capacity = float(capacity)
+        state_dir = state_dir or settings.AI_RATE_LIMIT_STATE_DIR
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, f'{name}.bucket')
+
+    def _update(self, fn):
+        """Apply fn(tokens, now) -> (tokens, result) atomically and return result"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 256)
+            now = time.time()
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+            tokens = state.get('tokens', self.capacity)
+            updated = state.get('updated', now)
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+            tokens, result = fn(tokens, now)
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps({'tokens': tokens, 'updated': now}).encode())
+            return result
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def try_acquire(self, amount):
+        """Take `amount` tokens if available; otherwise return seconds to wait"""
+        amount = min(float(amount), self.capacity)
+
+        def take(tokens, now):
+            if tokens >= amount:
+                return tokens - amount, 0.0
+            return tokens, (amount - tokens) / self.rate
+
+        return self._update(take)
+
+    def acquire(self, amount):
+        """Block until `amount` tokens are taken; return total seconds waited"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return waited
+            # Sleep in short slices so other processes get a fair chance
+            wait = min(wait, 1.0)
+            time.sleep(wait)
+            waited += wait
+
+    def adjust(self, delta):
+        """Credit (positive) or debit (negative) tokens after the fact"""
+        self._update(lambda tokens, now: (min(self.capacity, tokens + delta), None))
+
+    def drain(self, seconds):
+        """Empty the bucket so nobody sends for roughly `seconds`"""
+        self._update(lambda tokens, now: (min(tokens, -self.rate * seconds), None))
+
+
+class ProviderRateLimiter:
+    """Requests-per-second and tokens-per-minute limits for one provider/API key"""
+
+    def __init__(self, provider, api_key, rps=0, tpm=0):
+        self.provider = provider
+        key_hash = hashlib.sha256((api_key or '').encode()).hexdigest()[:12]
+        self.request_bucket = None
+        self.token_bucket = None
+        if rps:
+            # Allow a burst of one second's worth of requests
+            self.request_bucket = TokenBucket(f'{provider}-{key_hash}-rps', rps, max(1.0, rps))
+        if tpm:
+            self.token_bucket = TokenBucket(f'{provider}-{key_hash}-tpm', tpm / 60.0, tpm)
+
+    def wait(self, tokens=0):
+        """Block until both budgets allow a call; record the throttle time"""
+        waited = 0.0
+        if self.request_bucket:
+            waited += self.request_bucket.acquire(1)
+        if self.token_bucket and tokens:
+            waited += self.token_bucket.acquire(tokens)
+        get_stats(self.provider).record_throttle(waited)
+        return waited
+
+    def settle_tokens(self, estimated, actual):
+        """Correct the token budget once the provider reports real usage"""
+        if self.token_bucket and actual is not None:
+            self.token_bucket.adjust(estimated - actual)
+
+    def back_off(self, seconds):
+        """Provider said slow down (429): pause every caller sharing this key"""
+        if self.request_bucket:
+            self.request_bucket.drain(seconds)
+
+
+_limiters_lock = threading.Lock()
+_limiters = {}
+
+
+def get_rate_limiter(provider, api_key):
+    """Shared limiter for a provider/API key, configured from AI_RATE_LIMITS"""
+    key = (provider, api_key)
+    with _limiters_lock:
+        if key not in _limiters:
+            config = settings.AI_RATE_LIMITS.get(provider, {})
+            _limiters[key] = ProviderRateLimiter(
+                provider, api_key, rps=config.get('rps', 0), tpm=config.get('tpm', 0)
+            )
+        return _limiters[key]
@@ -0,0 +1,328 @@
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.conf import settings
+
+from prj_file_proceed.metrics import percentile
+
+# HTTP status codes that indicate a transient provider problem worth retrying
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class RetryableError(Exception):
+    """Transient provider failure; may carry a server-suggested retry delay"""
+
+    def __init__(self, message, retry_after=None, status_code=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is rejecting calls"""
+
+
+def parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_retryable(response):
+    """Raise RetryableError if the response status is transient"""
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableError(
+            f"{response.status_code} - {response.text}",
+            retry_after=parse_retry_after(response.headers.get('Retry-After')),
+            status_code=response.status_code,
+        )
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        self.max_attempts = max_attempts or settings.AI_RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else settings.AI_RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else settings.AI_RETRY_MAX_DELAY
+
+    def get_delay(self, attempt, retry_after=None):
+        """Delay before retry number `attempt` (0-based)"""
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, backoff)
+        if retry_after is not None:
+            # The provider knows better than our backoff curve
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker: closed -> open -> half_open -> closed"""
+
+    def __init__(self, failure_threshold=None, recovery_timeout=None):
+        self.failure_threshold = failure_threshold or settings.AI_CIRCUIT_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or settings.AI_CIRCUIT_RECOVERY_TIMEOUT
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Return True if a call may go out now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            # half_open: let exactly one probe through
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """End a call that says nothing about provider health without changing state"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def retry_in(self):
+        """Seconds until the breaker will allow a probe"""
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+
+class ProviderStats:
+    """Rolling error and latency statistics for one provider"""
+
+    def __init__(self, window=200):
+        self.calls = deque(maxlen=window)  # (finished_at, latency_seconds, ok)
+        self.total_calls = 0
+        self.total_failures = 0
+        self.total_retries = 0
+        self.short_circuited = 0
+        self.throttled_calls = 0
+        self.throttle_wait_total = 0.0
+        self.throttle_wait_max = 0.0
+        self.payload_bytes_original = 0
+        self.payload_bytes_sent = 0
+        self.images = deque(maxlen=window)  # (end-to-end seconds, ok) per image
+        self._lock = threading.Lock()
+
+    def record_call(self, latency, ok):
+        with self._lock:
+            self.calls.append((time.time(), latency, ok))
+            self.total_calls += 1
+            if not ok:
+                self.total_failures += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.total_retries += 1
+
+    def record_short_circuit(self):
+        with self._lock:
+            self.short_circuited += 1
+
+    def record_throttle(self, waited):
+        """Time a call spent waiting on the client-side rate limiter"""
+        if waited <= 0:
+            return
+        with self._lock:
+            self.throttled_calls += 1
+            self.throttle_wait_total += waited
+            self.throttle_wait_max = max(self.throttle_wait_max, waited)
+
+    def record_payload(self, original_bytes, sent_bytes):
+        with self._lock:
+            self.payload_bytes_original += original_bytes
+            self.payload_bytes_sent += sent_bytes
+
+    def record_image(self, latency, ok):
+        """Outcome of one image: end-to-end time (preprocessing, upload and analysis) and whether it got a valid answer"""
+        with self._lock:
+            self.images.append((latency, ok))
+
+    def latency_percentile(self, pct, successful_only=True):
+        """Percentile (seconds) of single HTTP call latency over the rolling window, or None"""
+        with self._lock:
+            latencies = [lat for _, lat, ok in self.calls if ok or not successful_only]
+        return percentile(latencies, pct)
+
+    def image_latency_percentile(self, pct):
+        """Percentile (seconds) of end-to-end time per successful image, or None.
+
+        Unlike latency_percentile this covers every call an image needs (Dify
+        uploads, then runs the workflow), so providers compare fairly. Failed
+        images are left out: a provider that fails fast isn't a fast provider.
+        """
+        with self._lock:
+            latencies = [lat for lat, ok in self.images if ok]
+        return percentile(latencies, pct)
+
+    def image_error_rate(self):
+        """Share of images without a valid answer, including 4xx responses and failed workflows"""
+        with self._lock:
+            if not self.images:
+                return 0.0
+            return sum(1 for _, ok in self.images if not ok) / len(self.images)
+
+    def error_rate(self):
+        with self._lock:
+            if not self.calls:
+                return 0.0
+            return sum(1 for _, _, ok in self.calls if not ok) / len(self.calls)
+
+    def snapshot(self):
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        image_p50 = self.image_latency_percentile(50)
+        image_p95 = self.image_latency_percentile(95)
+        with self._lock:
+            window_size = len(self.calls)
+            data = {
+                'total_calls': self.total_calls,
+                'total_failures': self.total_failures,
+                'total_retries': self.total_retries,
+                'short_circuited': self.short_circuited,
+                'window_size': window_size,
+                'throttled_calls': self.throttled_calls,
+                'throttle_wait_total_s': round(self.throttle_wait_total, 3),
+                'throttle_wait_max_s': round(self.throttle_wait_max, 3),
+                'payload_bytes_original': self.payload_bytes_original,
+                'payload_bytes_sent': self.payload_bytes_sent,
+            }
+        data['image_latency_p50_ms'] = round(image_p50 * 1000, 1) if image_p50 is not None else None
+        data['image_latency_p95_ms'] = round(image_p95 * 1000, 1) if image_p95 is not None else None
+        data['error_rate'] = round(self.error_rate(), 4)
+        data['image_error_rate'] = round(self.image_error_rate(), 4)
+        data['latency_p50_ms'] = round(p50 * 1000, 1) if p50 is not None else None
+        data['latency_p95_ms'] = round(p95 * 1000, 1) if p95 is not None else None
+        return data
+
+
+_registry_lock = threading.Lock()
+_breakers = {}
+_stats = {}
+
+
+def get_breaker(provider):
+    with _registry_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker()
+        return _breakers[provider]
+
+
+def get_stats(provider):
+    with _registry_lock:
+        if provider not in _stats:
+            _stats[provider] = ProviderStats()
+        return _stats[provider]
+
+
+def provider_stats_snapshot():
+    """Stats and breaker state for every provider seen by this process"""
+    with _registry_lock:
+        providers = sorted(set(_breakers) | set(_stats))
+    snapshot = {}
+    for provider in providers:
+        breaker = get_breaker(provider)
+        data = get_stats(provider).snapshot()
+        data['circuit_state'] = breaker.state
+        data['circuit_retry_in_s'] = round(breaker.retry_in(), 1)
+        snapshot[provider] = data
+    return snapshot
+
+
+def call_with_resilience(provider, attempt_fn, max_attempts=None, policy=None,
+                         limiter=None, tokens=0):
+    """Run attempt_fn with retries, backoff and the provider's circuit breaker.
+
+    attempt_fn performs a single call. It should raise RetryableError for
+    transient failures; network errors from requests are treated the same way.
+    Any other exception is passed straight through without retrying.
+    If a rate limiter is given, every attempt waits on it first (`tokens` is
+    the estimated token cost of the call).
+    """
+    policy = policy or RetryPolicy(max_attempts=max_attempts)
+    breaker = get_breaker(provider)
+    stats = get_stats(provider)
+    last_error = None
+
+    for attempt in range(policy.max_attempts):
+        if not breaker.allow_request():
+            stats.record_short_circuit()
+            raise CircuitOpenError(
+                f"{provider} circuit is open after repeated failures; "
+                f"retry in {breaker.retry_in():.0f}s"
+            )
+
+        if limiter:
+            limiter.wait(tokens)
+
+        started = time.monotonic()
+        try:
+            result = attempt_fn()
+        except (RetryableError, requests.exceptions.RequestException) as e:
+            stats.record_call(time.monotonic() - started, ok=False)
+            breaker.record_failure()
+            last_error = e
+        except Exception:
+            # Not a provider health problem (bad input, client-side bug): count it
+            # neither way, but free the half-open probe slot for the next call
+            breaker.release_probe()
+            raise
+        else:
+            stats.record_call(time.monotonic() - started, ok=True)
+            breaker.record_success()
+            return result
+
+        if breaker.state == 'open':
+            # This failure tripped the breaker; don't sleep just to be rejected
+            stats.record_short_circuit()
+            raise CircuitOpenError(f"{provider} circuit opened: {last_error}")
+
+        if attempt < policy.max_attempts - 1:
+            retry_after = getattr(last_error, 'retry_after', None)
+            delay = policy.get_delay(attempt, retry_after)
+            if limiter and getattr(last_error, 'status_code', None) == 429:
+                limiter.back_off(delay)
+            stats.record_retry()
+            print(f"{provider} call failed ({last_error}), retrying in {delay:.1f}s "
+                  f"[{attempt + 1}/{policy.max_attempts}]")
+            time.sleep(delay)
+
+    raise last_error
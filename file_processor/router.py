@@ -0,0 +1,145 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .models import AnalysisResult, ImageAnalysis
+from .resilience import get_breaker, get_stats
+from .services import DifyAPIService
+from .zhipu_service import ZhipuVisionService, zhipu_result_valid
+
+PROVIDERS = ('dify', 'zhipu')
+
+# Requests keep running after the other provider wins (requests can't be
+# cancelled mid-flight), so the pool is sized for both legs of every hedge.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.AI_ROUTER_MAX_WORKERS,
+                                           thread_name_prefix='ai-router')
+        return _executor
+
+
+class ProviderRouter:
+    """Route each image to the fastest healthy provider, hedging slow calls.
+
+    Providers are ranked on the per-image latency and error rate kept by
+    resilience.ProviderStats (per image, not per HTTP call: Dify needs an
+    upload and a workflow run for each image, ZHIPU one request). If the
+    primary hasn't answered after its p95 image latency, the same image is
+    sent to the other provider and the first valid result wins. An invalid
+    or failed answer fails over immediately.
+    """
+
+    def __init__(self):
+        self.services = {
+            'dify': DifyAPIService(),
+            'zhipu': ZhipuVisionService(),
+        }
+
+    def _score(self, provider):
+        """Lower is better: expected latency inflated by the worse of the call and image error rates"""
+        stats = get_stats(provider)
+        p50 = stats.image_latency_percentile(50)
+        if p50 is None:
+            # No data yet; give the provider a chance to build a history
+            p50 = settings.AI_ROUTER_DEFAULT_LATENCY
+        error_rate = max(stats.error_rate(), stats.image_error_rate())
+        return p50 / max(0.05, 1.0 - error_rate)
+
+    def rank_providers(self):
+        """Healthy providers first, each group ordered by score"""
+        def key(provider):
+            unhealthy = get_breaker(provider).state == 'open'
+            return (unhealthy, self._score(provider))
+        return sorted(PROVIDERS, key=key)
+
+    def hedge_delay(self, provider):
+        p95 = get_stats(provider).image_latency_percentile(95)
+        if p95 is None:
+            p95 = settings.AI_ROUTER_DEFAULT_LATENCY
+        return min(max(p95, settings.AI_ROUTER_MIN_HEDGE_DELAY), settings.AI_ROUTER_MAX_HEDGE_DELAY)
+
+    def _call(self, provider, image_path):
+        """Run one provider; return (provider, valid, result_data)"""
+        service = self.services[provider]
+        started = time.monotonic()
+        valid = False
+        try:
+            if provider == 'dify':
+                valid, result_data = service.analyze_single_image(image_path)
+                return provider, valid, result_data
+            result = service.analyze_single_image(image_path)
+            valid = zhipu_result_valid(result)
+            return provider, valid, result
+        finally:
+            # Also for hedge legs that lose: they still show how fast the provider is.
+            # Invalid answers and exceptions count as failed images.
+            get_stats(provider).record_image(time.monotonic() - started, bool(valid))
+
+    def analyze(self, image_path):
+        """Return (provider, result_data) for the first valid answer"""
+        executor = _get_executor()
+        primary, secondary = self.rank_providers()
+        pending = {executor.submit(self._call, primary, image_path)}
+        fallback = None
+        hedged = False
+
+        done, pending = wait(pending, timeout=self.hedge_delay(primary))
+        while True:
+            for future in done:
+                provider, valid, result_data = future.result()
+                if valid:
+                    return provider, result_data
+                fallback = fallback or (provider, result_data)
+            if not hedged:
+                # Primary is slow or gave a bad answer: bring in the other provider
+                hedged = True
+                if done:
+                    print(f"{primary} failed, failing over to {secondary}")
+                else:
+                    print(f"{primary} slower than hedge delay, hedging with {secondary}")
+                pending.add(executor.submit(self._call, secondary, image_path))
+            if not pending:
+                return fallback
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def analyze_images(self, analysis_id):
+        """Analyze every image of an ImageAnalysis with per-image routing"""
+        try:
+            analysis = ImageAnalysis.objects.get(id=analysis_id)
+            analysis.status = 'processing'
+            analysis.save()
+
+            for image in analysis.images.all():
+                started = time.monotonic()
+                try:
+                    provider, result_data = self.analyze(image.image_file.path)
+                except Exception as e:
+                    provider, result_data = '', {"error": str(e)}
+                print(f"Image {image} answered by {provider or 'nobody'} "
+                      f"in {time.monotonic() - started:.1f}s")
+
+                AnalysisResult.objects.create(
+                    analysis=analysis,
+                    image=image,
+                    result_data=result_data,
+                    provider=provider
+                )
+
+            analysis.status = 'completed'
+            analysis.save()
+
+        except Exception as e:
+            print(f"Auto-routed analysis failed: {str(e)}")
+            try:
+                analysis.status = 'failed'
+                analysis.save()
+            except:
+                pass
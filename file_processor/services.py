@@ -1,7 +1,13 @@
 import os
+import time
 import requests
 from django.conf import settings
+from .image_preprocess import ImagePreprocessor
 from .models import ImageAnalysis, AnalysisResult
+from .rate_limit import get_rate_limiter
+from .resilience import (
+    CircuitOpenError, RetryableError, call_with_resilience, get_stats, raise_for_retryable,
+)
 
 class DifyAPIService:
     def __init__(self):
@@ -10,6 +16,8 @@ class DifyAPIService:
         self.server = settings.DIFY_SERVER
         # timeout for requests to Dify (seconds)
         self.timeout = int(os.getenv('DIFY_TIMEOUT', '60'))
+        self.rate_limiter = get_rate_limiter('dify', self.api_key)
+        self.preprocessor = ImagePreprocessor()
     
     def upload_image(self, image_path):
         """Upload image to Dify and return file_id"""
@@ -25,18 +33,23 @@ class DifyAPIService:
         file_size = os.path.getsize(image_path)
         print(f"File size: {file_size} bytes")
         
-        ext = os.path.splitext(image_path)[-1].lower()
-        mime = 'image/png' if ext == '.png' else 'image/jpeg'
-        print(f"File extension: {ext}, MIME type: {mime}")
+        prepared = self.preprocessor.prepare(image_path)
+        get_stats('dify').record_payload(prepared.original_bytes, prepared.sent_bytes)
+        print(f"Upload payload: {prepared.sent_bytes} bytes ({prepared.mime}, "
+              f"original {prepared.original_bytes} bytes, cache hit: {prepared.cache_hit})")
         
-        try:
-            with open(image_path, 'rb') as file:
-                files = {'file': (os.path.basename(image_path), file, mime)}
+        def attempt():
+            with open(prepared.path, 'rb') as file:
+                files = {'file': (prepared.filename, file, prepared.mime)}
                 data = {'user': self.user}
                 print(f"Sending request to: {url}")
                 response = requests.post(url, headers=headers, files=files, data=data, timeout=self.timeout)
-
             print(f"Upload response status: {response.status_code}")
+            raise_for_retryable(response)
+            return response
+
+        try:
+            response = call_with_resilience('dify', attempt, limiter=self.rate_limiter)
             if response.status_code == 201:
                 file_id = response.json().get('id')
                 print(f"Upload successful, file_id: {file_id}")
@@ -48,12 +61,16 @@ class DifyAPIService:
             raise Exception(f"File not found: {image_path}")
         except PermissionError:
             raise Exception(f"Permission denied accessing file: {image_path}")
+        except CircuitOpenError as e:
+            raise Exception(f"Upload skipped: {str(e)}")
+        except RetryableError as e:
+            raise Exception(f"Upload failed: {str(e)}")
         except requests.exceptions.RequestException as e:
             raise Exception(f"Upload request failed: {str(e)}")
         except Exception as e:
             raise Exception(f"Unexpected error uploading file: {str(e)}")
     
-    def run_workflow(self, file_id, max_retries=3):
+    def run_workflow(self, file_id, max_retries=None):
         """Run Dify workflow and return analysis result with retry mechanism"""
         url = f"{self.server}/v1/workflows/run"
         headers = {
@@ -94,46 +111,85 @@ class DifyAPIService:
         
         data = data_formats[0]  # Start with original format
         
-        for attempt in range(max_retries):
-            try:
-                print(f"Workflow attempt {attempt + 1}/{max_retries}")
-                response = requests.post(url, headers=headers, json=data, timeout=self.timeout)
+        def attempt():
+            response = requests.post(url, headers=headers, json=data, timeout=self.timeout)
+            raise_for_retryable(response)
+            if response.status_code != 200:
+                # Other errors - don't retry
+                return False, {}, f"Workflow failed: {response.status_code} - {response.text}"
 
-                if response.status_code == 200:
-                    resp_json = response.json()
-                    wf_status = resp_json.get("data", {}).get("status")
-                    if wf_status == "succeeded":
-                        outputs = resp_json.get("data", {}).get("outputs", {})
-                        return True, outputs.get("result", {}), ""
-                    else:
-                        error_info = resp_json.get("data", {}).get("error") or resp_json.get("message")
-                        if attempt < max_retries - 1 and "internal_server_error" in str(error_info).lower():
-                            print(f"Server error, retrying in 5 seconds...")
-                            import time
-                            time.sleep(5)
-                            continue
-                        return False, {}, error_info
-                elif response.status_code == 500:
-                    # Server error - retry
-                    if attempt < max_retries - 1:
-                        print(f"Server 500 error, retrying in 5 seconds...")
-                        import time
-                        time.sleep(5)
-                        continue
-                    return False, {}, f"Dify server error after {max_retries} attempts: {response.text}"
-                else:
-                    # Other errors - don't retry
-                    return False, {}, f"Workflow failed: {response.status_code} - {response.text}"
-                    
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    print(f"Request failed, retrying in 5 seconds: {str(e)}")
-                    import time
-                    time.sleep(5)
-                    continue
-                return False, {}, f"Workflow request failed after {max_retries} attempts: {str(e)}"
+            resp_json = response.json()
+            wf_status = resp_json.get("data", {}).get("status")
+            if wf_status == "succeeded":
+                outputs = resp_json.get("data", {}).get("outputs", {})
+                return True, outputs.get("result", {}), ""
+            error_info = resp_json.get("data", {}).get("error") or resp_json.get("message")
+            if "internal_server_error" in str(error_info).lower():
+                raise RetryableError(str(error_info))
+            return False, {}, error_info
+
+        try:
+            return call_with_resilience(
+                'dify', attempt, max_attempts=max_retries,
+                limiter=self.rate_limiter, tokens=settings.DIFY_TOKENS_PER_RUN,
+            )
+        except CircuitOpenError as e:
+            return False, {}, f"Dify unavailable: {str(e)}"
+        except RetryableError as e:
+            return False, {}, f"Dify server error after retries: {str(e)}"
+        except requests.exceptions.RequestException as e:
+            return False, {}, f"Workflow request failed after retries: {str(e)}"
+    
+    def analyze_single_image(self, file_path):
+        """Upload one image and run the workflow; return (success, result_data)"""
+        try:
+            print(f"Processing image: {file_path}")
+            
+            # Verify file exists
+            if not os.path.exists(file_path):
+                raise Exception(f"Image file not found: {file_path}")
+            
+            # Upload image to Dify
+            print(f"Uploading image to Dify...")
+            file_id = self.upload_image(file_path)
+            print(f"Upload successful, file_id: {file_id}")
+            
+            # Run workflow
+            print(f"Running workflow...")
+            success, result_data, error_msg = self.run_workflow(file_id)
+            
+            if success:
+                print(f"Workflow successful")
+                return True, result_data
+            
+            print(f"Workflow failed: {error_msg}")
+            error_msg = str(error_msg)
+            # Create user-friendly error message
+            if "internal_server_error" in error_msg.lower() or "500" in error_msg:
+                friendly_error = {
+                    "error": "AI Analysis Service Configuration Issue",
+                    "message": "The Dify workflow has a configuration problem that needs to be fixed.",
+                    "technical_details": error_msg,
+                    "suggestions": [
+                        "Check Dify workflow configuration in the dashboard",
+                        "Verify all workflow nodes are properly connected",
+                        "Ensure the workflow input parameter matches 'upload' or 'image'",
+                        "Test the workflow manually in Dify dashboard first"
+                    ],
+                    "status": "workflow_error"
+                }
+            else:
+                friendly_error = {
+                    "error": "Analysis failed",
+                    "technical_details": error_msg,
+                    "suggestion": "Please check if the image contains a valid Chinese e-invoice.",
+                    "status": "analysis_error"
+                }
+            return False, friendly_error
         
-        return False, {}, "Max retries exceeded"
+        except Exception as e:
+            print(f"Exception processing image {file_path}: {str(e)}")
+            return False, {"error": str(e)}
     
     def analyze_images(self, analysis_id):
         """Analyze multiple images for a given analysis"""
@@ -148,70 +204,17 @@ class DifyAPIService:
             print(f"Dify User: {self.user}")
             
             for image in analysis.images.all():
-                try:
-                    file_path = image.image_file.path
-                    print(f"Processing image: {file_path}")
-                    
-                    # Verify file exists
-                    if not os.path.exists(file_path):
-                        raise Exception(f"Image file not found: {file_path}")
-                    
-                    # Upload image to Dify
-                    print(f"Uploading image to Dify...")
-                    file_id = self.upload_image(file_path)
-                    print(f"Upload successful, file_id: {file_id}")
-                    
-                    # Run workflow
-                    print(f"Running workflow...")
-                    success, result_data, error_msg = self.run_workflow(file_id)
-                    
-                    if success:
-                        print(f"Workflow successful")
-                        # Save result to database
-                        AnalysisResult.objects.create(
-                            analysis=analysis,
-                            image=image,
-                            result_data=result_data
-                        )
-                    else:
-                        print(f"Workflow failed: {error_msg}")
-                        # Create user-friendly error message
-                        if "internal_server_error" in error_msg.lower() or "500" in error_msg:
-                            friendly_error = {
-                                "error": "AI Analysis Service Configuration Issue",
-                                "message": "The Dify workflow has a configuration problem that needs to be fixed.",
-                                "technical_details": error_msg,
-                                "suggestions": [
-                                    "Check Dify workflow configuration in the dashboard",
-                                    "Verify all workflow nodes are properly connected",
-                                    "Ensure the workflow input parameter matches 'upload' or 'image'",
-                                    "Test the workflow manually in Dify dashboard first"
-                                ],
-                                "status": "workflow_error"
-                            }
-                        else:
-                            friendly_error = {
-                                "error": "Analysis failed",
-                                "technical_details": error_msg,
-                                "suggestion": "Please check if the image contains a valid Chinese e-invoice.",
-                                "status": "analysis_error"
-                            }
-                        
-                        # Save error result
-                        AnalysisResult.objects.create(
-                            analysis=analysis,
-                            image=image,
-                            result_data=friendly_error
-                        )
+                image_started = time.monotonic()
+                success, result_data = self.analyze_single_image(image.image_file.path)
+                get_stats('dify').record_image(time.monotonic() - image_started, success)
                 
-                except Exception as e:
-                    print(f"Exception processing image {image}: {str(e)}")
-                    # Save exception result
-                    AnalysisResult.objects.create(
-                        analysis=analysis,
-                        image=image,
-                        result_data={"error": str(e)}
-                    )
+                # Save result (or user-friendly error) to database
+                AnalysisResult.objects.create(
+                    analysis=analysis,
+                    image=image,
+                    result_data=result_data,
+                    provider='dify'
+                )
             
             analysis.status = 'completed'
             analysis.save()
@@ -1,3 +1,51 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import resilience
+from .resilience import get_stats
+from .router import ProviderRouter
+
+
+class ProviderRouterTests(SimpleTestCase):
+    def setUp(self):
+        for registry in (resilience._stats, resilience._breakers):
+            patcher = mock.patch.dict(registry, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = ProviderRouter()
+        self.dify = mock.Mock()
+        self.dify.analyze_single_image.return_value = (True, {'invoice': 'dify'})
+        self.zhipu = mock.Mock()
+        self.router.services = {'dify': self.dify, 'zhipu': self.zhipu}
+        for _ in range(5):
+            get_stats('dify').record_image(1.0, True)
+
+    def test_fast_failing_provider_is_demoted(self):
+        # An HTTP 200 with an error payload: no RetryableError, so the call itself counts as ok
+        self.zhipu.analyze_single_image.return_value = {'success': False, 'error': 'API error: 400'}
+        for _ in range(3):
+            provider, valid, _ = self.router._call('zhipu', 'page.png')
+            self.assertEqual((provider, valid), ('zhipu', False))
+
+        stats = get_stats('zhipu')
+        self.assertIsNone(stats.image_latency_percentile(50))
+        self.assertEqual(stats.image_error_rate(), 1.0)
+        self.assertEqual(self.router.rank_providers(), ['dify', 'zhipu'])
+
+    def test_exception_counts_as_failed_image(self):
+        self.zhipu.analyze_single_image.side_effect = ValueError('bad workflow')
+        with self.assertRaises(ValueError):
+            self.router._call('zhipu', 'page.png')
+        self.assertEqual(get_stats('zhipu').image_error_rate(), 1.0)
+        self.assertEqual(self.router.rank_providers()[0], 'dify')
+
+    def test_failover_answer_comes_from_healthy_provider(self):
+        self.zhipu.analyze_single_image.return_value = {'success': False, 'error': 'API error: 401'}
+        get_stats('zhipu').record_image(0.5, True)  # looked fastest before it broke
+        self.assertEqual(self.router.rank_providers()[0], 'zhipu')
+
+        for _ in range(4):
+            self.assertEqual(self.router.analyze('page.png'), ('dify', {'invoice': 'dify'}))
+        self.assertEqual(self.router.rank_providers()[0], 'dify')
+        self.assertEqual(get_stats('zhipu').image_latency_percentile(50), 0.5)
@@ -19,6 +19,7 @@ urlpatterns = [
     path('analysis/', views.image_analysis, name='image_analysis'),
     path('analysis/list/', views.analysis_list, name='analysis_list'),
     path('analysis/detail/<int:pk>/', views.analysis_detail, name='analysis_detail'),
+    path('analysis/provider-stats/', views.provider_stats, name='provider_stats'),
     
     # OCR URLs
     path('extract-text/<int:pk>/', views.extract_text, name='extract_text'),
@@ -8,6 +8,7 @@ from .models import PDFConversion, ConvertedImage, ImageAnalysis, AnalysisResult
 from .forms import PDFUploadForm, CustomUserCreationForm, ImageSelectionForm
 from .services import DifyAPIService
 from .ocr_service import OCRService
+from .resilience import provider_stats_snapshot
 import fitz  # PyMuPDF
 import os
 from django.conf import settings
@@ -95,13 +96,16 @@ def image_analysis(request):
             if analysis_type == 'zhipu':
                 from .zhipu_service import ZhipuVisionService
                 service = ZhipuVisionService()
+            elif analysis_type == 'auto':
+                from .router import ProviderRouter
+                service = ProviderRouter()
             else:
                 service = DifyAPIService()
             
             thread = threading.Thread(target=service.analyze_images, args=(analysis.id,))
             thread.start()
             
-            model_name = 'ZHIPU Vision' if analysis_type == 'zhipu' else 'Dify API'
+            model_name = analysis.get_analysis_type_display()
             messages.success(request, f'{model_name} analysis started for {selected_images.count()} images!')
             return redirect('analysis_detail', pk=analysis.pk)
     else:
@@ -122,6 +126,13 @@ def analysis_detail(request, pk):
         'results': results
     })
 
+@login_required
+def provider_stats(request):
+    """Per-provider error/latency statistics and circuit breaker state (admin only)"""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    return JsonResponse({'providers': provider_stats_snapshot()})
+
 @login_required
 def analysis_list(request):
     if request.user.is_superuser:
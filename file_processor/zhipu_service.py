@@ -2,33 +2,92 @@ import requests
 import base64
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from .image_preprocess import ImagePreprocessor
 from .models import ImageAnalysis, AnalysisResult
+from .rate_limit import get_rate_limiter
+from .resilience import (
+    CircuitOpenError, RetryableError, call_with_resilience, get_stats, raise_for_retryable,
+)
+
+# Rough token cost of one page image in GLM-4V, used for the TPM budget
+IMAGE_TOKEN_ESTIMATE = 1000
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session():
+    """Process-wide HTTP session so requests reuse pooled keep-alive connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.ZHIPU_MAX_CONCURRENCY)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+@lru_cache(maxsize=1)
+def _load_system_prompt():
+    """Read the system prompt once per process"""
+    prompt_file = os.path.join(settings.BASE_DIR, 'vision_model_system_prompt.txt')
+    try:
+        with open(prompt_file, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return """你是一个专业的发票信息提取助手。请从图片中提取发票信息，并以JSON格式输出。"""
+
+
+def zhipu_result_valid(result):
+    """Whether an analyze_single_image result holds a usable answer"""
+    return bool(result and result.get('success') and 'error' not in result.get('data', {}))
+
 
 class ZhipuVisionService:
     def __init__(self):
         self.api_key = os.getenv('ZHIPU_API_KEY')
         self.api_url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+        self.rate_limiter = get_rate_limiter('zhipu', self.api_key)
+        self.preprocessor = ImagePreprocessor()
         
     def _encode_image_to_base64(self, image_path):
         """Convert image to base64 string"""
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
     
+    def _prepare_image(self, image_path):
+        """Downscale/recompress the image and return (mime, base64 data)"""
+        prepared = self.preprocessor.prepare(image_path)
+        get_stats('zhipu').record_payload(prepared.original_bytes, prepared.sent_bytes)
+        return prepared.mime, self._encode_image_to_base64(prepared.path)
+    
     def _get_system_prompt(self):
-        """Load system prompt from file"""
-        prompt_file = os.path.join(settings.BASE_DIR, 'vision_model_system_prompt.txt')
+        """Load system prompt (cached after the first read)"""
+        return _load_system_prompt()
+    
+    def _extract_json(self, content):
+        """Pull the JSON object out of a model reply that may contain extra text"""
         try:
-            with open(prompt_file, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            return """你是一个专业的发票信息提取助手。请从图片中提取发票信息，并以JSON格式输出。"""
+            start_idx = content.find('{')
+            end_idx = content.rfind('}') + 1
+            if start_idx != -1 and end_idx != 0:
+                return json.loads(content[start_idx:end_idx])
+            return {"raw_response": content, "error": "No valid JSON found"}
+        except json.JSONDecodeError:
+            return {"raw_response": content, "error": "JSON parsing failed"}
     
     def analyze_single_image(self, image_path):
         """Analyze single invoice image using ZHIPU AI GLM-4V"""
         try:
-            # Encode image to base64
-            base64_image = self._encode_image_to_base64(image_path)
+            # Shrink and encode image to base64
+            mime, base64_image = self._prepare_image(image_path)
             
             # Prepare request payload
             payload = {
@@ -44,7 +103,7 @@ class ZhipuVisionService:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+                                    "url": f"data:{mime};base64,{base64_image}"
                                 }
                             }
                         ]
@@ -60,33 +119,37 @@ class ZhipuVisionService:
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
+            def attempt():
+                response = _get_session().post(self.api_url, headers=headers, json=payload, timeout=30)
+                raise_for_retryable(response)
+                return response
+
+            prompt_text = payload["messages"][0]["content"][0]["text"]
+            estimated_tokens = len(prompt_text) + IMAGE_TOKEN_ESTIMATE + payload["max_tokens"]
+            response = call_with_resilience(
+                'zhipu', attempt, limiter=self.rate_limiter, tokens=estimated_tokens
+            )
             response.raise_for_status()
             
             # Parse response
             result = response.json()
+            self.rate_limiter.settle_tokens(
+                estimated_tokens, result.get('usage', {}).get('total_tokens')
+            )
             content = result['choices'][0]['message']['content']
             
-            # Try to parse JSON from response
-            try:
-                # Extract JSON from response (in case there's extra text)
-                start_idx = content.find('{')
-                end_idx = content.rfind('}') + 1
-                if start_idx != -1 and end_idx != 0:
-                    json_str = content[start_idx:end_idx]
-                    parsed_data = json.loads(json_str)
-                else:
-                    parsed_data = {"raw_response": content, "error": "No valid JSON found"}
-            except json.JSONDecodeError:
-                parsed_data = {"raw_response": content, "error": "JSON parsing failed"}
-            
             return {
                 'success': True,
-                'data': parsed_data,
+                'data': self._extract_json(content),
                 'raw_response': content
             }
             
-        except requests.exceptions.RequestException as e:
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': f"ZHIPU unavailable: {str(e)}"
+            }
+        except (RetryableError, requests.exceptions.RequestException) as e:
             return {
                 'success': False,
                 'error': f"API request failed: {str(e)}"
@@ -97,24 +160,47 @@ class ZhipuVisionService:
                 'error': f"Analysis failed: {str(e)}"
             }
     
+    def _timed_analyze(self, image_path):
+        started = time.monotonic()
+        result = None
+        try:
+            result = self.analyze_single_image(image_path)
+            return result
+        finally:
+            get_stats('zhipu').record_image(time.monotonic() - started, zhipu_result_valid(result))
+    
     def analyze_images(self, analysis_id):
-        """Analyze multiple images for an ImageAnalysis"""
+        """Analyze multiple images for an ImageAnalysis.
+
+        Up to ZHIPU_MAX_CONCURRENCY chat completions run at once; each result
+        is saved as soon as its request finishes.
+        """
         try:
             analysis = ImageAnalysis.objects.get(id=analysis_id)
             analysis.status = 'processing'
             analysis.save()
             
-            images = analysis.images.all()
+            images = list(analysis.images.all())
             
-            for image in images:
-                result = self.analyze_single_image(image.image_file.path)
-                
-                # Save result
-                AnalysisResult.objects.create(
-                    analysis=analysis,
-                    image=image,
-                    result_data=result
-                )
+            with ThreadPoolExecutor(max_workers=settings.ZHIPU_MAX_CONCURRENCY) as executor:
+                futures = {
+                    executor.submit(self._timed_analyze, image.image_file.path): image
+                    for image in images
+                }
+                for future in as_completed(futures):
+                    image = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'success': False, 'error': f"Analysis failed: {str(e)}"}
+                    
+                    # Save result
+                    AnalysisResult.objects.create(
+                        analysis=analysis,
+                        image=image,
+                        result_data=result,
+                        provider='zhipu'
+                    )
             
             analysis.status = 'completed'
             analysis.save()
@@ -8,7 +8,10 @@ backlog = 2048
 
 # Worker processes
 workers = 2
-worker_class = "sync"
+# "uvicorn.workers.UvicornWorker" (with GUNICORN_APP=prj_file_proceed.asgi:application)
+# enables the webcam WebSocket; add WEBCAM_ASYNC_VIEW=True so HTTP webcam frames no
+# longer hold a worker for the whole inference
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
 worker_connections = 1000
 timeout = 120  # Increased timeout for Dify API calls
 keepalive = 2
@@ -53,6 +56,16 @@ def worker_int(worker):
     """Called just after a worker has been killed by a signal."""
     worker.log.info("worker received INT or QUIT signal")
 
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application."""
+    from django.conf import settings
+    if settings.YOLO_PRELOAD:
+        from video_detection.model_registry import registry
+        try:
+            registry.preload()
+        except Exception as e:
+            worker.log.warning("YOLO preload failed: %s", e)
+
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
     server.log.info("Worker spawned (pid: %s)", worker.pid)
\ No newline at end of file
@@ -3,6 +3,12 @@ ASGI config for prj_file_proceed project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+WebSocket connections are not handled by Django itself; the webcam stream
+is dispatched to video_detection.websocket. Serve this module with an ASGI
+server (e.g. GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker), and set
+WEBCAM_ASYNC_VIEW=True so HTTP webcam frames go to the async view instead of
+holding the thread that runs Django's sync views.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +19,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prj_file_proceed.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up (it loads models)
+from video_detection.websocket import WEBCAM_WS_PATH, webcam_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Route the webcam WebSocket to its raw handler, everything else to Django"""
+    if scope['type'] == 'websocket':
+        if scope['path'] == WEBCAM_WS_PATH:
+            return await webcam_websocket(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 4404})
+    return await django_application(scope, receive, send)
@@ -0,0 +1,10 @@
+"""Statistics helpers shared by the apps' latency reporting"""
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(pct / 100.0 * len(values)) - 1)]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -145,6 +146,180 @@ DIFY_API_KEY = os.getenv('DIFY_API_KEY')
 DIFY_USER = os.getenv('DIFY_USER')
 DIFY_SERVER = os.getenv('DIFY_SERVER')
 
+# AI provider resilience (shared by Dify and ZHIPU clients)
+AI_RETRY_MAX_ATTEMPTS = int(os.getenv('AI_RETRY_MAX_ATTEMPTS', '3'))
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', '1.0'))  # seconds
+AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', '30.0'))  # seconds
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('AI_CIRCUIT_FAILURE_THRESHOLD', '5'))
+AI_CIRCUIT_RECOVERY_TIMEOUT = float(os.getenv('AI_CIRCUIT_RECOVERY_TIMEOUT', '60'))  # seconds
+
+# Client-side rate limits per provider (0 disables a limit). Bucket state is kept
+# in AI_RATE_LIMIT_STATE_DIR so all gunicorn workers and background threads share it.
+AI_RATE_LIMITS = {
+    'dify': {
+        'rps': float(os.getenv('DIFY_RATE_LIMIT_RPS', '0')),
+        'tpm': int(os.getenv('DIFY_RATE_LIMIT_TPM', '0')),
+    },
+    'zhipu': {
+        'rps': float(os.getenv('ZHIPU_RATE_LIMIT_RPS', '0')),
+        'tpm': int(os.getenv('ZHIPU_RATE_LIMIT_TPM', '0')),
+    },
+}
+AI_RATE_LIMIT_STATE_DIR = os.getenv('AI_RATE_LIMIT_STATE_DIR', '/tmp/file_processor_ratelimit')
+# Estimated token cost of one Dify workflow run, used for the Dify TPM budget
+DIFY_TOKENS_PER_RUN = int(os.getenv('DIFY_TOKENS_PER_RUN', '3000'))
+
+# Number of ZHIPU chat-completion requests an analysis may have in flight at once
+ZHIPU_MAX_CONCURRENCY = int(os.getenv('ZHIPU_MAX_CONCURRENCY', '4'))
+
+# "Auto" analysis routing: assumed latency before a provider has history, and
+# bounds for the p95-based delay before a hedged request goes to the other provider
+AI_ROUTER_DEFAULT_LATENCY = float(os.getenv('AI_ROUTER_DEFAULT_LATENCY', '15'))  # seconds
+AI_ROUTER_MIN_HEDGE_DELAY = float(os.getenv('AI_ROUTER_MIN_HEDGE_DELAY', '2'))  # seconds
+AI_ROUTER_MAX_HEDGE_DELAY = float(os.getenv('AI_ROUTER_MAX_HEDGE_DELAY', '30'))  # seconds
+# Threads for router calls; both legs of a hedge keep running, so two per image in flight
+AI_ROUTER_MAX_WORKERS = int(os.getenv('AI_ROUTER_MAX_WORKERS', '8'))
+
+# Image preprocessing before upload to AI providers (variants cached in MEDIA_ROOT/ai_cache)
+AI_IMAGE_PREPROCESS = os.getenv('AI_IMAGE_PREPROCESS', 'True').lower() == 'true'
+AI_IMAGE_MAX_EDGE = int(os.getenv('AI_IMAGE_MAX_EDGE', '1600'))  # pixels, longest side
+AI_IMAGE_GRAYSCALE = os.getenv('AI_IMAGE_GRAYSCALE', 'False').lower() == 'true'
+AI_IMAGE_FORMAT = os.getenv('AI_IMAGE_FORMAT', 'JPEG')  # JPEG, WEBP or PNG
+AI_IMAGE_QUALITY = int(os.getenv('AI_IMAGE_QUALITY', '85'))
+# ai_cache cleanup: entries unused for AI_CACHE_MAX_AGE_DAYS are removed, then the least
+# recently used until the directory is under AI_CACHE_MAX_MB (0 disables either limit).
+# Runs while caching new variants, at most every AI_CACHE_CLEANUP_INTERVAL seconds per
+# cache directory, or on demand with `manage.py clean_ai_cache`
+AI_CACHE_MAX_AGE_DAYS = float(os.getenv('AI_CACHE_MAX_AGE_DAYS', '30'))
+AI_CACHE_MAX_MB = float(os.getenv('AI_CACHE_MAX_MB', '2048'))
+AI_CACHE_CLEANUP_INTERVAL = float(os.getenv('AI_CACHE_CLEANUP_INTERVAL', '3600'))
+
+# YOLO object detection: default weights, warm-up inference after loading, and
+# whether gunicorn workers load the model at boot instead of on first request
+YOLO_MODEL = os.getenv('YOLO_MODEL', 'yolov8n.pt')
+YOLO_WARMUP = os.getenv('YOLO_WARMUP', 'True').lower() == 'true'
+YOLO_PRELOAD = os.getenv('YOLO_PRELOAD', 'False').lower() == 'true'
+# Number of sampled video frames sent to the model in one call
+YOLO_BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', '8'))
+# Detection filtering: minimum confidence, NMS IoU threshold and optional
+# comma-separated COCO class id allow-list (empty = all classes)
+YOLO_CONFIDENCE = float(os.getenv('YOLO_CONFIDENCE', '0.25'))
+YOLO_IOU = float(os.getenv('YOLO_IOU', '0.7'))
+YOLO_CLASSES = [int(c) for c in os.getenv('YOLO_CLASSES', '').split(',') if c.strip()] or None
+# Inference backend: 'torch' (PyTorch eager), 'onnx' (ONNX Runtime) or 'openvino'.
+# Other backends export YOLO_MODEL once at YOLO_IMGSZ into YOLO_EXPORT_DIR; YOLO_INT8
+# quantizes the export, calibrated on images in YOLO_CALIBRATION_DIR
+YOLO_BACKEND = os.getenv('YOLO_BACKEND', 'torch')
+YOLO_IMGSZ = int(os.getenv('YOLO_IMGSZ', '640'))
+YOLO_INT8 = os.getenv('YOLO_INT8', 'False').lower() == 'true'
+YOLO_EXPORT_DIR = os.getenv('YOLO_EXPORT_DIR', os.path.join(BASE_DIR, 'model_exports'))
+YOLO_CALIBRATION_DIR = os.getenv('YOLO_CALIBRATION_DIR', os.path.join(MEDIA_ROOT, 'yolo_calibration'))
+
+# Frames larger than the model input are shrunk (INTER_AREA) to the profile's imgsz on the longest
+# side before inference, on the video decode thread; boxes are mapped back to original
+# pixels. Large webcam JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that still covers it
+YOLO_DOWNSCALE_INPUT = os.getenv('YOLO_DOWNSCALE_INPUT', 'True').lower() == 'true'
+YOLO_REDUCED_DECODE = os.getenv('YOLO_REDUCED_DECODE', 'True').lower() == 'true'
+
+# Video processing DB writes: DetectionResult rows per bulk insert, and how often
+# processed_frames is saved (whichever of seconds / percent of the video comes first)
+VIDEO_RESULT_FLUSH_SIZE = int(os.getenv('VIDEO_RESULT_FLUSH_SIZE', '200'))
+VIDEO_PROGRESS_INTERVAL = float(os.getenv('VIDEO_PROGRESS_INTERVAL', '1.0'))
+VIDEO_PROGRESS_PERCENT = float(os.getenv('VIDEO_PROGRESS_PERCENT', '1.0'))
+
+# Video frame sampling: analyze every Nth frame, or one frame every N seconds if
+# VIDEO_SAMPLE_SECONDS is set. Strides of at least VIDEO_SEEK_MIN_STRIDE frames
+# seek instead of grabbing (0 = always grab). Decoded frames wait in a queue
+# of VIDEO_DECODE_QUEUE_SIZE while inference catches up.
+VIDEO_SAMPLE_STRIDE = int(os.getenv('VIDEO_SAMPLE_STRIDE', '5'))
+VIDEO_SAMPLE_SECONDS = float(os.getenv('VIDEO_SAMPLE_SECONDS', '0'))
+VIDEO_SEEK_MIN_STRIDE = int(os.getenv('VIDEO_SEEK_MIN_STRIDE', '0'))
+VIDEO_DECODE_QUEUE_SIZE = int(os.getenv('VIDEO_DECODE_QUEUE_SIZE', '16'))
+
+# Chunked video processing: videos of at least VIDEO_PARALLEL_MIN_FRAMES frames are split
+# into frame ranges detected by VIDEO_PARALLEL_WORKERS processes (0 or 1 = one thread),
+# each with its own capture and model. 'spawn' keeps the workers independent of the
+# threads of the web worker that starts them
+VIDEO_PARALLEL_WORKERS = int(os.getenv('VIDEO_PARALLEL_WORKERS', '0'))
+VIDEO_PARALLEL_MIN_FRAMES = int(os.getenv('VIDEO_PARALLEL_MIN_FRAMES', '1800'))
+VIDEO_PARALLEL_START_METHOD = os.getenv('VIDEO_PARALLEL_START_METHOD', 'spawn')
+
+# Detection profiles, chosen per upload or webcam session and recorded on each
+# VideoDetection: model variant, inference image size, confidence threshold, class
+# allow-list (ids or names) and 'stride' (frames between analyzed video frames).
+# Missing keys fall back to the YOLO_* / VIDEO_SAMPLE_* settings above; the
+# YOLO_PROFILES variable (JSON) adds or replaces profiles
+YOLO_PROFILES = {
+    'balanced': {},
+    'fast': {'model': 'yolov8n.pt', 'imgsz': 320, 'stride': 10},
+    'accurate': {'model': 'yolov8s.pt', 'imgsz': 960, 'conf': 0.15, 'stride': 2},
+}
+YOLO_PROFILES.update(json.loads(os.getenv('YOLO_PROFILES') or '{}'))
+YOLO_DEFAULT_PROFILE = os.getenv('YOLO_DEFAULT_PROFILE', 'balanced')
+
+# Motion-gated adaptive sampling: run YOLO only when the downscaled frame differs
+# from the last analyzed one by more than VIDEO_MOTION_THRESHOLD (mean absolute
+# gray-level difference, 0-255), with min/max intervals in frames
+VIDEO_ADAPTIVE_SAMPLING = os.getenv('VIDEO_ADAPTIVE_SAMPLING', 'False').lower() == 'true'
+VIDEO_MOTION_THRESHOLD = float(os.getenv('VIDEO_MOTION_THRESHOLD', '6.0'))
+VIDEO_MIN_SAMPLE_INTERVAL = int(os.getenv('VIDEO_MIN_SAMPLE_INTERVAL', '2'))
+VIDEO_MAX_SAMPLE_INTERVAL = int(os.getenv('VIDEO_MAX_SAMPLE_INTERVAL', '90'))
+
+# Object tracking across analyzed frames: minimum IoU to continue a track, analyzed
+# frames a track may go unseen before it is closed, detections needed to keep a
+# track, and seconds between stored trajectory points
+VIDEO_TRACK_IOU = float(os.getenv('VIDEO_TRACK_IOU', '0.3'))
+VIDEO_TRACK_MAX_MISSED = int(os.getenv('VIDEO_TRACK_MAX_MISSED', '3'))
+VIDEO_TRACK_MIN_HITS = int(os.getenv('VIDEO_TRACK_MIN_HITS', '2'))
+VIDEO_TRACK_TRAJECTORY_INTERVAL = float(os.getenv('VIDEO_TRACK_TRAJECTORY_INTERVAL', '1.0'))
+
+# Annotated MP4 output (optional per upload): the first FourCC the OpenCV build can
+# encode is used (avc1 = H.264, playable in browsers; mp4v as fallback). Encoding runs
+# on its own thread behind a queue of VIDEO_RENDER_QUEUE_SIZE frames. Frames decoded for
+# detection wait for the next analyzed frame's boxes; once VIDEO_RENDER_MAX_HELD frames
+# are waiting, the pending inference batch runs early
+VIDEO_RENDER_CODECS = [c.strip() for c in os.getenv('VIDEO_RENDER_CODECS', 'avc1,mp4v').split(',') if c.strip()]
+VIDEO_RENDER_QUEUE_SIZE = int(os.getenv('VIDEO_RENDER_QUEUE_SIZE', '32'))
+VIDEO_RENDER_MAX_HELD = int(os.getenv('VIDEO_RENDER_MAX_HELD', '64'))
+
+# Frames per page of the detection results JSON endpoint (clients may ask for up to the max)
+VIDEO_RESULTS_PAGE_SIZE = int(os.getenv('VIDEO_RESULTS_PAGE_SIZE', '50'))
+VIDEO_RESULTS_MAX_PAGE_SIZE = int(os.getenv('VIDEO_RESULTS_MAX_PAGE_SIZE', '500'))
+
+# Incremental results feed polled by the detail page while a video is processing:
+# at most VIDEO_FEED_MAX_FRAMES new frames per response, polled every VIDEO_FEED_POLL_INTERVAL seconds
+VIDEO_FEED_MAX_FRAMES = int(os.getenv('VIDEO_FEED_MAX_FRAMES', '200'))
+VIDEO_FEED_POLL_INTERVAL = float(os.getenv('VIDEO_FEED_POLL_INTERVAL', '2.0'))
+
+# Webcam WebSocket (served by prj_file_proceed/asgi.py): largest accepted JPEG frame in bytes
+WEBCAM_WS_MAX_FRAME_BYTES = int(os.getenv('WEBCAM_WS_MAX_FRAME_BYTES', str(2 * 1024 * 1024)))
+# Webcam backpressure: one frame in flight per client (shared across workers through
+# WEBCAM_GATE_STATE_DIR), older queued frames are dropped, and a waiting frame is dropped
+# after WEBCAM_MAX_FRAME_WAIT seconds. Clients are told to capture every
+# average server time * WEBCAM_INTERVAL_HEADROOM ms, clamped to the min/max. The average
+# skips each client's first (warm-up) frame and gives new frames WEBCAM_INTERVAL_SMOOTHING weight
+WEBCAM_GATE_STATE_DIR = os.getenv('WEBCAM_GATE_STATE_DIR', '/tmp/video_detection_webcam')
+# Gate files of clients that sent no frame for this many seconds are deleted
+WEBCAM_GATE_IDLE_SECONDS = float(os.getenv('WEBCAM_GATE_IDLE_SECONDS', '600'))
+WEBCAM_MAX_FRAME_WAIT = float(os.getenv('WEBCAM_MAX_FRAME_WAIT', '1.0'))
+WEBCAM_INTERVAL_HEADROOM = float(os.getenv('WEBCAM_INTERVAL_HEADROOM', '1.2'))
+WEBCAM_INTERVAL_SMOOTHING = float(os.getenv('WEBCAM_INTERVAL_SMOOTHING', '0.5'))
+WEBCAM_MIN_INTERVAL_MS = int(os.getenv('WEBCAM_MIN_INTERVAL_MS', '100'))
+WEBCAM_MAX_INTERVAL_MS = int(os.getenv('WEBCAM_MAX_INTERVAL_MS', '2000'))
+# Cross-session batching of webcam frames: a thread per worker process collects frames
+# for up to WEBCAM_MAX_BATCH_WAIT_MS (or WEBCAM_MAX_BATCH frames) and runs one model call.
+# Helps when a worker serves several clients at once (ASGI or threaded workers)
+WEBCAM_BATCHING = os.getenv('WEBCAM_BATCHING', 'False').lower() == 'true'
+WEBCAM_MAX_BATCH = int(os.getenv('WEBCAM_MAX_BATCH', '8'))
+WEBCAM_MAX_BATCH_WAIT_MS = float(os.getenv('WEBCAM_MAX_BATCH_WAIT_MS', '5'))
+# Async webcam frames (needs prj_file_proceed.asgi): the webcam page posts to the async view,
+# which like the WebSocket runs decoding and inference on a per-process executor of
+# WEBCAM_EXECUTOR_WORKERS threads; frames beyond WEBCAM_EXECUTOR_QUEUE waiting ones are dropped.
+# With WEBCAM_BATCHING, more workers let more frames meet in one batch
+WEBCAM_ASYNC_VIEW = os.getenv('WEBCAM_ASYNC_VIEW', 'False').lower() == 'true'
+WEBCAM_EXECUTOR_WORKERS = int(os.getenv('WEBCAM_EXECUTOR_WORKERS', '2'))
+WEBCAM_EXECUTOR_QUEUE = int(os.getenv('WEBCAM_EXECUTOR_QUEUE', '4'))
+
 # Allow serving media files directly when running a playground/testing instance.
 # Set SERVE_MEDIA=True in .env to let Django serve MEDIA_URL even when DEBUG=False.
 SERVE_MEDIA = os.getenv('SERVE_MEDIA', 'False').lower() == 'true'
@@ -27,7 +27,8 @@ python3 manage.py migrate
 
 # Start gunicorn
 echo "Starting Gunicorn server..."
-exec gunicorn -c gunicorn.conf.py prj_file_proceed.wsgi:application
+# GUNICORN_APP=prj_file_proceed.asgi:application (with an ASGI worker class) serves the webcam WebSocket
+exec gunicorn -c gunicorn.conf.py "${GUNICORN_APP:-prj_file_proceed.wsgi:application}"
 
 # 查看当前进程（确认 PID）
 #ps aux | grep gunicorn | grep prj_file_proceed | grep -v grep
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import VideoDetection, DetectionResult
+from .models import VideoDetection, DetectionResult, DetectionTrack, DetectionArchive
 
 class DetectionResultInline(admin.TabularInline):
     model = DetectionResult
@@ -8,8 +8,8 @@ class DetectionResultInline(admin.TabularInline):
 
 @admin.register(VideoDetection)
 class VideoDetectionAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'user', 'source_type', 'status', 'total_frames', 'processed_frames', 'created_at')
-    list_filter = ('source_type', 'status', 'created_at', 'user')
+    list_display = ('__str__', 'user', 'source_type', 'storage_mode', 'status', 'total_frames', 'processed_frames', 'created_at')
+    list_filter = ('source_type', 'storage_mode', 'status', 'created_at', 'user')
     readonly_fields = ('total_frames', 'processed_frames', 'status', 'created_at')
     inlines = [DetectionResultInline]
 
@@ -17,4 +17,16 @@ class VideoDetectionAdmin(admin.ModelAdmin):
 class DetectionResultAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'video_detection', 'frame_number', 'timestamp', 'created_at')
     list_filter = ('created_at', 'video_detection__user')
-    readonly_fields = ('detections', 'created_at')
\ No newline at end of file
+    readonly_fields = ('detections', 'created_at')
+
+@admin.register(DetectionTrack)
+class DetectionTrackAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'video_detection', 'first_timestamp', 'last_timestamp', 'hits')
+    list_filter = ('class_name', 'video_detection__user')
+    readonly_fields = ('trajectory',)
+
+
+@admin.register(DetectionArchive)
+class DetectionArchiveAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'detection_count', 'frame_count', 'duration', 'created_at')
+    readonly_fields = ('class_names',)
\ No newline at end of file
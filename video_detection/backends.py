@@ -0,0 +1,152 @@
+import fcntl
+import os
+import shutil
+
+from django.conf import settings
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+CALIBRATION_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def exported_model_path(variant, backend, int8=False, imgsz=None):
+    """Where the export of variant for backend lives (a file for ONNX, a directory for OpenVINO)"""
+    imgsz = imgsz or settings.YOLO_IMGSZ
+    stem = os.path.splitext(os.path.basename(variant))[0]
+    name = f"{stem}_{imgsz}{'_int8' if int8 else ''}"
+    if backend == 'onnx':
+        name += '.onnx'
+    elif backend == 'openvino':
+        name += '_openvino_model'
+    else:
+        raise ValueError(f"No export for backend '{backend}'")
+    return os.path.join(settings.YOLO_EXPORT_DIR, name)
+
+
+def calibration_images(calibration_dir=None):
+    calibration_dir = calibration_dir or settings.YOLO_CALIBRATION_DIR
+    if not os.path.isdir(calibration_dir):
+        return []
+    return sorted(
+        os.path.join(calibration_dir, name) for name in os.listdir(calibration_dir)
+        if name.lower().endswith(CALIBRATION_IMAGE_EXTENSIONS)
+    )
+
+
+def resolve_model(variant, backend=None, int8=None, imgsz=None):
+    """Return the path YOLO() should load for variant on backend.
+
+    The first call for a non-torch backend exports the PyTorch weights and
+    later calls (in any worker process) reuse the exported files. An
+    exclusive flock keeps workers booting together from exporting twice.
+    """
+    backend = backend or settings.YOLO_BACKEND
+    int8 = settings.YOLO_INT8 if int8 is None else int8
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == 'torch' or not variant.endswith(('.pt', '.yaml')):
+        return variant  # PyTorch, or already an exported model
+
+    target = exported_model_path(variant, backend, int8, imgsz)
+    if os.path.exists(target):
+        return target
+    os.makedirs(settings.YOLO_EXPORT_DIR, exist_ok=True)
+    fd = os.open(os.path.join(settings.YOLO_EXPORT_DIR, '.export.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if not os.path.exists(target):
+            export_model(variant, backend, int8, imgsz=imgsz)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+    return target
+
+
+def export_model(variant, backend, int8=False, calibration_dir=None, imgsz=None):
+    """Export PyTorch weights to ONNX or OpenVINO IR and return the exported path.
+
+    INT8 models are calibrated on the images in calibration_dir (frames from
+    our own videos, see the export_yolo_model command): OpenVINO through
+    ultralytics/NNCF, ONNX through ONNX Runtime static quantization.
+    """
+    from ultralytics import YOLO
+
+    imgsz = imgsz or settings.YOLO_IMGSZ
+    calibration_dir = calibration_dir or settings.YOLO_CALIBRATION_DIR
+    target = exported_model_path(variant, backend, int8, imgsz)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if int8 and not calibration_images(calibration_dir):
+        raise ValueError(
+            f"INT8 export needs calibration images in {calibration_dir}; "
+            "run 'manage.py export_yolo_model --calibration-video <video>' first"
+        )
+
+    model = YOLO(variant)
+    if backend == 'onnx':
+        # Dynamic batch so batched video inference works with any batch size
+        exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True, verbose=False)
+        if int8:
+            _quantize_onnx(exported, target, calibration_dir, imgsz)
+            os.remove(exported)
+        else:
+            shutil.move(exported, target)
+    else:
+        kwargs = {}
+        if int8:
+            kwargs = {'int8': True, 'data': _calibration_yaml(calibration_dir, model.names)}
+        exported = model.export(format='openvino', imgsz=imgsz, dynamic=True, verbose=False, **kwargs)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+    print(f"Exported {variant} to {target}")
+    return target
+
+
+def _calibration_yaml(calibration_dir, names):
+    """Minimal ultralytics dataset file that points at the calibration images"""
+    path = os.path.join(calibration_dir, 'calibration.yaml')
+    with open(path, 'w') as f:
+        f.write(f"path: {os.path.abspath(calibration_dir)}\ntrain: .\nval: .\nnames:\n")
+        for class_id, name in names.items():
+            f.write(f"  {class_id}: {name}\n")
+    return path
+
+
+def letterbox(image, imgsz):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz, as ultralytics does before inference"""
+    import cv2
+    import numpy as np
+
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def _quantize_onnx(source, target, calibration_dir, imgsz):
+    import cv2
+    import numpy as np
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, paths, input_name):
+            self.paths = iter(paths)
+            self.input_name = input_name
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            image = letterbox(cv2.imread(path), imgsz)
+            blob = image[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0  # BGR HWC -> RGB NCHW
+            return {self.input_name: np.ascontiguousarray(blob)}
+
+    import onnxruntime
+    input_name = onnxruntime.InferenceSession(source, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    quantize_static(
+        source, target, FrameReader(calibration_images(calibration_dir), input_name),
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True
+    )
@@ -0,0 +1,203 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+
+def recommended_interval_ms(average_ms):
+    """Capture interval a client should use given the average server time per frame"""
+    interval = average_ms * settings.WEBCAM_INTERVAL_HEADROOM if average_ms else settings.WEBCAM_MIN_INTERVAL_MS
+    return int(min(settings.WEBCAM_MAX_INTERVAL_MS, max(settings.WEBCAM_MIN_INTERVAL_MS, interval)))
+
+
+def update_average_ms(average_ms, sample_ms):
+    """Exponentially weighted average of server time per frame; new samples weigh WEBCAM_INTERVAL_SMOOTHING"""
+    if average_ms is None:
+        return sample_ms
+    weight = settings.WEBCAM_INTERVAL_SMOOTHING
+    return average_ms * (1 - weight) + sample_ms * weight
+
+
+_last_cleanup = {}  # state_dir -> time.monotonic() of the last clean_idle_gates in this process
+_cleanup_lock = threading.Lock()
+
+
+def clean_idle_gates(state_dir, max_idle=None):
+    """Delete the files of client keys that sent no frame for max_idle seconds.
+
+    Client keys include a per-tab id, so without this the state directory
+    grows by two files for every page load. A key whose slot is locked (a
+    frame in flight) is kept. Returns the number of keys removed.
+    """
+    max_idle = settings.WEBCAM_GATE_IDLE_SECONDS if max_idle is None else max_idle
+    cutoff = time.time() - max_idle
+    removed = 0
+    for entry in os.scandir(state_dir):
+        if not entry.name.endswith('.state'):
+            continue
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue  # the state file is rewritten on every frame
+        except FileNotFoundError:
+            continue
+        slot_path = entry.path[:-len('.state')] + '.slot'
+        try:
+            fd = os.open(slot_path, os.O_RDWR)
+        except FileNotFoundError:
+            fd = None
+        try:
+            if fd is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+            for path in (entry.path, slot_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+        finally:
+            if fd is not None:
+                os.close(fd)
+    return removed
+
+
+def _maybe_clean(state_dir):
+    """clean_idle_gates at most once per WEBCAM_GATE_IDLE_SECONDS per process"""
+    now = time.monotonic()
+    with _cleanup_lock:
+        if now - _last_cleanup.get(state_dir, float('-inf')) < settings.WEBCAM_GATE_IDLE_SECONDS:
+            return
+        _last_cleanup[state_dir] = now
+    clean_idle_gates(state_dir)
+
+
+class FrameGate:
+    """Latest-frame-wins admission for one webcam client.
+
+    At most one frame per client is processed at a time, across every
+    gunicorn worker: the in-flight slot is an exclusive flock on a per-client
+    file. A frame that arrives while another is in flight waits for the slot,
+    but gives up as soon as a newer frame from the same client arrives or
+    when it has waited WEBCAM_MAX_FRAME_WAIT seconds, so queued requests
+    never pile up behind slow inference. Files of idle clients are removed
+    by clean_idle_gates().
+    """
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, client_key, state_dir=None, max_wait=None):
+        self.state_dir = state_dir or settings.WEBCAM_GATE_STATE_DIR
+        digest = hashlib.sha256(client_key.encode()).hexdigest()[:16]
+        self.state_path = os.path.join(self.state_dir, f'{digest}.state')
+        self.slot_path = os.path.join(self.state_dir, f'{digest}.slot')
+        self.max_wait = settings.WEBCAM_MAX_FRAME_WAIT if max_wait is None else max_wait
+
+    def _update(self, fn):
+        """Apply fn(state) -> result to the locked JSON state file and return result"""
+        fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 256)
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+            result = fn(state)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps(state).encode())
+            return result
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _take_ticket(self, state):
+        state['latest'] = state.get('latest', 0) + 1
+        return state['latest']
+
+    def _latest(self, state):
+        return state.get('latest', 0)
+
+    def _record(self, seconds):
+        def update(state):
+            # The client's first frame pays for model loading and warm-up; the average starts after it
+            if not state.get('warmed_up'):
+                state['warmed_up'] = True
+                return state.get('avg_ms')
+            state['avg_ms'] = update_average_ms(state.get('avg_ms'), seconds * 1000)
+            return state['avg_ms']
+        return self._update(update)
+
+    def recommended_interval_ms(self):
+        return recommended_interval_ms(self._update(lambda state: state.get('avg_ms')))
+
+    def _enter(self):
+        """Take a ticket and open the slot file; returns (ticket, slot fd)"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        _maybe_clean(self.state_dir)
+        ticket = self._update(self._take_ticket)
+        return ticket, os.open(self.slot_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _try_slot(self, fd, ticket, deadline):
+        """True once the slot is held, False if the frame is to be dropped, None to try again"""
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if time.monotonic() > deadline or self._update(self._latest) != ticket:
+                return False  # stale, or superseded by a newer frame
+            return None
+        if self._update(self._latest) != ticket:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return False  # a newer frame arrived while we were getting the slot
+        return True
+
+    @contextmanager
+    def admit(self):
+        """Yield True if this frame may be processed now, False if it was dropped"""
+        ticket, fd = self._enter()
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while (admitted := self._try_slot(fd, ticket, deadline)) is None:
+                time.sleep(self.POLL_INTERVAL)
+            if not admitted:
+                yield False
+                return
+            try:
+                started = time.monotonic()
+                yield True
+                self._record(time.monotonic() - started)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    @asynccontextmanager
+    async def admit_async(self):
+        """admit() for async views, without blocking the event loop.
+
+        The file locking runs in a thread and waiting for the slot sleeps.
+        """
+        ticket, fd = await asyncio.to_thread(self._enter)
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while (admitted := await asyncio.to_thread(self._try_slot, fd, ticket, deadline)) is None:
+                await asyncio.sleep(self.POLL_INTERVAL)
+            if not admitted:
+                yield False
+                return
+            try:
+                started = time.monotonic()
+                yield True
+                await asyncio.to_thread(self._record, time.monotonic() - started)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,92 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+
+class BatchingInferenceServer:
+    """Collect single frames from concurrent callers and run them as one batch.
+
+    A daemon thread takes the first waiting frame, keeps collecting for up to
+    max_wait_ms (or until max_batch frames are queued), runs one model call
+    for all of them and hands each caller its own FrameDetections. Callers in
+    different requests, sockets or sessions share the batch, so the cores
+    run one batched inference instead of several competing batch-of-one calls.
+    """
+
+    def __init__(self, profile=None, max_batch=None, max_wait_ms=None):
+        from .yolo_service import YOLODetectionService
+
+        self.service = YOLODetectionService(profile=profile)
+        self.max_batch = max_batch or settings.WEBCAM_MAX_BATCH
+        self.max_wait = (settings.WEBCAM_MAX_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+        self._thread = threading.Thread(target=self._run, daemon=True, name='yolo-batcher')
+        self._thread.start()
+
+    def detect(self, frame, timeout=None):
+        """Detect objects in one frame; blocks until its batch has run"""
+        future = Future()
+        self._queue.put((frame, future))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.service.detect_batch_arrays([frame for frame, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), detections in zip(batch, results):
+                future.set_result(detections)
+            with self._stats_lock:
+                self.batches += 1
+                self.frames += len(batch)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'frames': self.frames,
+                'avg_batch_size': round(self.frames / self.batches, 2) if self.batches else None,
+            }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(profile=None):
+    """Process-wide batching server for a detection profile, started on first use"""
+    profile = profile or settings.YOLO_DEFAULT_PROFILE
+    with _batchers_lock:
+        if profile not in _batchers:
+            _batchers[profile] = BatchingInferenceServer(profile)
+        return _batchers[profile]
+
+
+def batcher_stats():
+    with _batchers_lock:
+        return {profile: batcher.stats() for profile, batcher in _batchers.items()}
@@ -0,0 +1,104 @@
+"""Helpers shared by the video detection benchmark commands"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def make_synthetic_video(path=None, frames=300, width=1280, height=720, fps=30.0, static_every=0):
+    """Write a test video with a few moving shapes and return its path.
+
+    If static_every is set, the scene freezes for that many frames out of
+    every 2 * static_every, which mimics surveillance footage.
+    """
+    import cv2
+    import numpy as np
+
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.mp4', prefix='yolo_bench_')
+        os.close(handle)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    shapes = [
+        (rng.integers(0, width), rng.integers(0, height), int(rng.integers(-8, 8)),
+         int(rng.integers(-6, 6)), tuple(int(c) for c in rng.integers(0, 255, 3)))
+        for _ in range(6)
+    ]
+    t = 0
+    for i in range(frames):
+        if not static_every or (i // static_every) % 2 == 0:
+            t += 1
+        frame = background.copy()
+        for x, y, dx, dy, color in shapes:
+            cx = int(x + dx * t) % width
+            cy = int(y + dy * t) % height
+            cv2.rectangle(frame, (cx, cy), (cx + width // 10, cy + height // 6), color, -1)
+            cv2.circle(frame, (cx + width // 20, cy - height // 20), height // 25, color, -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@contextmanager
+def throwaway_database():
+    """Run the block against a fresh, migrated SQLite file instead of the real database.
+
+    A file (not :memory:) so commits pay the same fsync cost as production,
+    and so connections from other threads see the same data.
+    """
+    from django.db import connection
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+    connection.settings_dict['TEST']['NAME'] = db_file
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if os.path.exists(db_file):
+            os.remove(db_file)
+
+
+def map50(predictions, references, iou_threshold=0.5):
+    """Mean average precision of predictions against reference detections.
+
+    Both arguments are lists of FrameDetections, one per frame. Used to
+    measure drift of an optimized backend against PyTorch output, which
+    serves as ground truth.
+    """
+    import numpy as np
+
+    from .tracking import iou_matrix
+
+    hits = {}  # class id -> [(confidence, is_true_positive)]
+    reference_counts = {}
+    for predicted, reference in zip(predictions, references):
+        for class_id in np.unique(reference.cls).tolist():
+            reference_counts[class_id] = reference_counts.get(class_id, 0) + int((reference.cls == class_id).sum())
+        ious = iou_matrix(predicted.xyxy, reference.xyxy)
+        matched = set()
+        for i in np.argsort(-predicted.conf).tolist():
+            class_id = int(predicted.cls[i])
+            candidates = [
+                j for j in np.flatnonzero(reference.cls == class_id).tolist()
+                if j not in matched and ious[i, j] >= iou_threshold
+            ]
+            best = max(candidates, key=lambda j: ious[i, j]) if candidates else None
+            if best is not None:
+                matched.add(best)
+            hits.setdefault(class_id, []).append((float(predicted.conf[i]), best is not None))
+
+    if not reference_counts:
+        return None
+    average_precisions = []
+    for class_id, count in reference_counts.items():
+        ranked = sorted(hits.get(class_id, []), key=lambda hit: -hit[0])
+        tp = np.cumsum([hit[1] for hit in ranked]) if ranked else np.zeros(0)
+        recall = np.r_[0.0, tp / count, 1.0]
+        precision = np.r_[1.0, tp / np.arange(1, len(ranked) + 1), 0.0]
+        # All-point interpolation: precision envelope, summed over recall steps
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        steps = np.flatnonzero(recall[1:] != recall[:-1])
+        average_precisions.append(float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1])))
+    return sum(average_precisions) / len(average_precisions)
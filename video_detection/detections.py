@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class FrameDetections:
+    """Detections for one frame held as parallel NumPy arrays.
+
+    xyxy is (N, 4) float32, conf is (N,) float32 and cls is (N,) int32.
+    Converting to the list-of-dicts format only happens at the edges
+    (JSON responses, DetectionResult rows) through to_dicts().
+    """
+
+    __slots__ = ('xyxy', 'conf', 'cls', 'names')
+
+    def __init__(self, xyxy, conf, cls, names):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+
+    @classmethod
+    def empty(cls, names):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32), names)
+
+    @classmethod
+    def from_array(cls, data, names):
+        """Build from an (N, 6|7) array of x1, y1, x2, y2, [track_id,] conf, cls"""
+        data = np.asarray(data, dtype=np.float32)
+        if data.size == 0:
+            return cls.empty(names)
+        return cls(data[:, :4], data[:, -2], data[:, -1].astype(np.int32), names)
+
+    @classmethod
+    def from_results(cls, results, names):
+        """Convert a batch of ultralytics Results with one device-to-host copy"""
+        import torch
+
+        tensors = [r.boxes.data if r.boxes is not None else None for r in results]
+        counts = [0 if t is None else len(t) for t in tensors]
+        present = [t for t in tensors if t is not None and len(t)]
+        if not present:
+            return [cls.empty(names) for _ in results]
+        if len({t.shape[1] for t in present}) > 1:
+            # Mixed tracked/untracked rows; keep only the common columns
+            present = [torch.cat([t[:, :4], t[:, -2:]], dim=1) for t in present]
+        stacked = torch.cat(present).cpu().numpy()
+
+        frames = []
+        offset = 0
+        for count in counts:
+            frames.append(cls.from_array(stacked[offset:offset + count], names))
+            offset += count
+        return frames
+
+    def __len__(self):
+        return len(self.conf)
+
+    def select(self, mask):
+        return FrameDetections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names)
+
+    def to_dicts(self):
+        """Legacy [{'class', 'confidence', 'bbox'}] format"""
+        boxes = self.xyxy.tolist()
+        confs = self.conf.tolist()
+        return [
+            {'class': self.names[c], 'confidence': conf, 'bbox': bbox}
+            for c, conf, bbox in zip(self.cls.tolist(), confs, boxes)
+        ]
+
+    def to_normalized(self, width, height):
+        """[{'class', 'confidence', 'box'}] with box as x1, y1, x2, y2 fractions of the frame size"""
+        boxes = (self.xyxy / np.array([width, height, width, height], dtype=np.float32)).round(4).tolist()
+        confs = self.conf.round(3).tolist()
+        return [
+            {'class': self.names[c], 'confidence': conf, 'box': box}
+            for c, conf, box in zip(self.cls.tolist(), confs, boxes)
+        ]
@@ -0,0 +1,84 @@
+import struct
+
+import numpy as np
+
+from .detections import FrameDetections
+
+# Start-of-frame markers (they carry the image size): C0-CF except DHT, JPG and DAC
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """(width, height) read from a JPEG header without decoding; None for other formats"""
+    if data[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1  # fill byte
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2  # markers without a length
+            continue
+        if marker in _SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+
+def input_scale(width, height, imgsz):
+    """Factor (at most 1) that brings the longest side down to the model input size"""
+    return min(1.0, imgsz / max(width, height))
+
+
+def reduced_decode(cv2, width, height, imgsz):
+    """(factor, imread flag) for the smallest libjpeg DCT-scaled decode still covering imgsz"""
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if max(width, height) // factor >= imgsz:
+            return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def rescale(detections, scale_x, scale_y):
+    """FrameDetections with boxes multiplied by the given factors, e.g. back to original pixels"""
+    if (scale_x == 1 and scale_y == 1) or not len(detections):
+        return detections
+    factors = np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+    return FrameDetections(detections.xyxy * factors, detections.conf, detections.cls, detections.names)
+
+
+class Downscaler:
+    """Resize video frames so their longest side is the model input size.
+
+    Used as a VideoFrameReader transform, so frames are shrunk on the
+    decode thread before they are queued: the queue holds small frames and
+    the model's letterbox has little left to do. restore() maps detections
+    on resized frames back to original pixel coordinates. The size comes
+    from the first frame, after any rotation the decoder applied.
+    """
+
+    def __init__(self, imgsz):
+        import cv2
+        self.cv2 = cv2
+        self.imgsz = imgsz
+        self.size = None
+        self.scale_x = self.scale_y = 1.0
+
+    def __call__(self, frame):
+        if self.size is None:
+            height, width = frame.shape[:2]
+            scale = input_scale(width, height, self.imgsz)
+            self.size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            self.scale_x = width / self.size[0]
+            self.scale_y = height / self.size[1]
+        if self.scale_x == 1 and self.scale_y == 1:
+            return frame
+        return self.cv2.resize(frame, self.size, interpolation=self.cv2.INTER_AREA)
+
+    def restore(self, detections):
+        return rescale(detections, self.scale_x, self.scale_y)
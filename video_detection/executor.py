@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class ExecutorBusy(Exception):
+    """Raised when the inference executor already holds its maximum of running and queued calls"""
+
+
+class InferenceExecutor:
+    """Bounded thread pool for webcam decoding and inference started from async code.
+
+    Under ASGI, the event loop hands CPU-bound work to these threads and
+    keeps serving other requests meanwhile. At most `workers` calls run and
+    `max_queued` more wait; beyond that run() raises ExecutorBusy at once,
+    so a burst of webcam frames is dropped instead of queueing without
+    limit. A slot is freed when the call finishes in its thread, not when
+    the awaiting request goes away.
+    """
+
+    def __init__(self, workers=None, max_queued=None):
+        self.workers = workers or settings.WEBCAM_EXECUTOR_WORKERS
+        self.max_queued = settings.WEBCAM_EXECUTOR_QUEUE if max_queued is None else max_queued
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='webcam-inference')
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queued)
+        self._lock = threading.Lock()
+        self._active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _call(self, fn, args):
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.completed += 1
+            self._slots.release()
+
+    async def run(self, fn, *args):
+        """Await fn(*args) run on the pool; raises ExecutorBusy when it is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorBusy(f"{self.workers} running and {self.max_queued} queued calls already")
+        with self._lock:
+            self._active += 1
+        try:
+            future = self._pool.submit(self._call, fn, args)
+        except BaseException:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+            raise
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'in_flight': self._active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The process-wide InferenceExecutor, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = InferenceExecutor()
+        return _executor
+
+
+def executor_stats():
+    return _executor.stats() if _executor is not None else None
@@ -1,17 +1,34 @@
 from django import forms
+from django.conf import settings
 from .models import VideoDetection
+from .profiles import profile_choices
 
 class VideoUploadForm(forms.ModelForm):
     class Meta:
         model = VideoDetection
-        fields = ['video_file']
+        fields = ['video_file', 'profile', 'storage_mode', 'render_annotated']
         widgets = {
+            'render_annotated': forms.CheckboxInput(attrs={
+                'class': 'mr-2 rounded border-gray-300'
+            }),
+            'storage_mode': forms.Select(attrs={
+                'class': 'block w-full rounded-md border-gray-300 text-sm'
+            }),
             'video_file': forms.FileInput(attrs={
                 'accept': 'video/*',
                 'class': 'block w-full text-sm text-gray-500 file:mr-4 file:py-2 file:px-4 file:rounded-full file:border-0 file:text-sm file:font-semibold file:bg-green-50 file:text-green-700 hover:file:bg-green-100'
             })
         }
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Profiles come from settings, so the choices are not part of the model field
+        self.fields['profile'] = forms.ChoiceField(
+            choices=profile_choices(),
+            initial=settings.YOLO_DEFAULT_PROFILE,
+            widget=forms.Select(attrs={'class': 'block w-full rounded-md border-gray-300 text-sm'})
+        )
+    
     def clean_video_file(self):
         video_file = self.cleaned_data.get('video_file')
         if video_file:
@@ -0,0 +1,78 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from video_detection.benchmarking import throwaway_database
+from video_detection.models import DetectionResult, VideoDetection
+from video_detection.persistence import DetectionResultBuffer, ProgressReporter
+
+
+class QueryTimer:
+    """execute_wrapper that adds up time spent in the database"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class Command(BaseCommand):
+    help = ('Compare total DB time per video for per-frame writes vs buffered bulk writes '
+            '(runs against a throwaway SQLite database, no inference)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=float, default=10, help='Simulated video length')
+        parser.add_argument('--fps', type=float, default=30)
+        parser.add_argument('--sample-every', type=int, default=5)
+        parser.add_argument('--objects', type=int, default=5, help='Detections per sampled frame')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            total_frames = int(options['minutes'] * 60 * options['fps'])
+            user = User.objects.create(username='benchmark')
+            detections = [
+                {'class': 'car', 'confidence': 0.9, 'bbox': [10.0, 20.0, 110.0, 220.0]}
+            ] * options['objects']
+
+            for name, writer in (('per-frame', self._per_frame), ('buffered', self._buffered)):
+                video = VideoDetection.objects.create(user=user, total_frames=total_frames, storage_mode='frames')
+                timer = QueryTimer()
+                started = time.perf_counter()
+                with connection.execute_wrapper(timer):
+                    writer(video, total_frames, options, detections)
+                wall = time.perf_counter() - started
+                rows = DetectionResult.objects.filter(video_detection=video).count()
+                self.stdout.write(
+                    f"{name:>10}: {timer.queries:6d} queries, DB time {timer.seconds:7.2f}s, "
+                    f"wall {wall:7.2f}s, {rows} result rows"
+                )
+
+    def _per_frame(self, video, total_frames, options, detections):
+        """The original loop: save() every frame, create() every sampled frame"""
+        for frame_count in range(total_frames):
+            if frame_count % options['sample_every'] == 0:
+                DetectionResult.objects.create(
+                    video_detection=video, frame_number=frame_count,
+                    timestamp=frame_count / options['fps'], detections=detections
+                )
+            video.processed_frames = frame_count + 1
+            video.save()
+
+    def _buffered(self, video, total_frames, options, detections):
+        result_buffer = DetectionResultBuffer(video)
+        progress = ProgressReporter(video)
+        for frame_count in range(total_frames):
+            if frame_count % options['sample_every'] == 0:
+                result_buffer.add(frame_count, frame_count / options['fps'], detections)
+            progress.update(frame_count + 1)
+        result_buffer.flush()
+        progress.update(total_frames, force=True)
@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from prj_file_proceed.metrics import percentile
+from video_detection.benchmarking import make_synthetic_video
+
+
+def _run_video(path, downscale):
+    """Read and detect a whole video in a fresh process; returns time per analyzed frame and peak memory"""
+    import numpy as np
+
+    from video_detection.model_registry import _rss_mb
+    from video_detection.yolo_service import YOLODetectionService
+
+    settings.YOLO_DOWNSCALE_INPUT = downscale
+    service = YOLODetectionService()
+    # Load and warm up outside the measurement
+    service.detect_objects(np.zeros((settings.YOLO_IMGSZ, settings.YOLO_IMGSZ, 3), dtype=np.uint8))
+    baseline = _rss_mb()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.wait(0.005):
+            peak[0] = max(peak[0], _rss_mb())
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    reader, motion_sampler = service._open_reader(path)
+    frames = 0
+    started = time.perf_counter()
+    for batch, _ in service._sampled_batches(reader, motion_sampler):
+        service._detect_entries(batch)
+        frames += len(batch)
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    return {'ms_per_frame': elapsed * 1000 / max(frames, 1), 'peak_mb': max(peak[0], _rss_mb()) - baseline}
+
+
+class Command(BaseCommand):
+    help = ('Measure per-frame time and peak memory of video detection with and without input '
+            'downscaling, and webcam JPEG decode time with full and reduced-resolution decoding, '
+            'for several source resolutions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resolutions', default='640x360,1280x720,1920x1080,3840x2160')
+        parser.add_argument('--frames', type=int, default=60, help='Frames in each synthetic video')
+        parser.add_argument('--decode-repeats', type=int, default=30)
+
+    def handle(self, *args, **options):
+        import cv2
+
+        from video_detection.downscale import input_scale, jpeg_size, reduced_decode
+
+        imgsz = settings.YOLO_IMGSZ
+        # fork: every run starts from the same parent, so peak memory deltas are comparable
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f"model {settings.YOLO_MODEL} at {imgsz}px, {options['frames']} frames per video, "
+                          f"sampling every {settings.VIDEO_SAMPLE_STRIDE} frames")
+        self.stdout.write(f"{'source':>10}{'ms per analyzed frame':>26}{'peak MB over idle':>26}{'JPEG decode ms':>26}")
+        self.stdout.write(f"{'':>10}{'full':>13}{'downscaled':>13}{'full':>13}{'downscaled':>13}"
+                          f"{'full':>13}{'reduced':>13}")
+        for resolution in options['resolutions'].split(','):
+            width, height = (int(v) for v in resolution.lower().split('x'))
+            path = make_synthetic_video(frames=options['frames'], width=width, height=height)
+            try:
+                runs = {}
+                for downscale in (False, True):
+                    with context.Pool(1) as pool:
+                        runs[downscale] = pool.apply(_run_video, (path, downscale))
+
+                cap = cv2.VideoCapture(path)
+                _, frame = cap.read()
+                cap.release()
+                jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1]
+                full, reduced = [], []
+                for _ in range(options['decode_repeats']):
+                    started = time.perf_counter()
+                    cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+                    full.append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    size = jpeg_size(jpeg.tobytes())
+                    _, flag = reduced_decode(cv2, *size, imgsz)
+                    small = cv2.imdecode(jpeg, flag)
+                    scale = input_scale(small.shape[1], small.shape[0], imgsz)
+                    if scale < 1:
+                        cv2.resize(small, (round(small.shape[1] * scale), round(small.shape[0] * scale)),
+                                   interpolation=cv2.INTER_AREA)
+                    reduced.append(time.perf_counter() - started)
+            finally:
+                os.remove(path)
+
+            self.stdout.write(
+                f"{resolution:>10}{runs[False]['ms_per_frame']:13.1f}{runs[True]['ms_per_frame']:13.1f}"
+                f"{runs[False]['peak_mb']:13.1f}{runs[True]['peak_mb']:13.1f}"
+                f"{percentile(full, 50) * 1000:13.2f}{percentile(reduced, 50) * 1000:13.2f}"
+            )
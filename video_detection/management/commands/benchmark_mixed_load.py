@@ -0,0 +1,195 @@
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from prj_file_proceed.metrics import percentile
+from video_detection.benchmarking import make_synthetic_video, throwaway_database
+
+
+async def _asgi_request(application, method, path, cookie, body=b''):
+    """Send one HTTP request through an ASGI application in-process; returns (status, body)"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'cookie', cookie.encode()),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    request_sent = False
+    never = asyncio.Event()
+    status, chunks = None, []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await never.wait()  # the client stays connected
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return status, b''.join(chunks)
+
+
+class Command(BaseCommand):
+    help = ('Measure page latency for a user browsing the site while webcam sessions stream frames '
+            'over HTTP at the recommended interval: with gunicorn-style sync workers, and through prj_file_proceed.asgi with the '
+            'sync and the async webcam view (in-process, against a throwaway database)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=2, help='Concurrent webcam sessions')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per scenario')
+        parser.add_argument('--page-interval', type=float, default=0.1, help='Seconds between page requests')
+        parser.add_argument('--workers', type=int, default=2, help='Sync workers in the WSGI scenario')
+        parser.add_argument('--width', type=int, default=640)
+        parser.add_argument('--height', type=int, default=480)
+
+    def handle(self, *args, **options):
+        import cv2
+
+        video_path = make_synthetic_video(frames=1, width=options['width'], height=options['height'])
+        cap = cv2.VideoCapture(video_path)
+        _, frame = cap.read()
+        cap.release()
+        os.remove(video_path)
+        jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+        self.frame = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode()
+        self.page_url = reverse('video_detection_home')
+
+        with throwaway_database():
+            user = User.objects.create(username='benchmark')
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            self.cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+            response = client.post(reverse('process_webcam_frame'), data=self._frame_body('warmup'),
+                                   content_type='application/json')  # load and warm up the model outside the timing
+            if not response.json().get('success'):
+                raise CommandError(f"Webcam endpoint failed: {response.content[:200]}")
+
+            sessions, duration = options['sessions'], options['duration']
+            self.stdout.write(f"{sessions} webcam sessions ({options['width']}x{options['height']}, detections mode), "
+                              f"page GET {self.page_url} every {options['page_interval'] * 1000:.0f} ms, "
+                              f"{duration:.0f} s per scenario")
+            self.stdout.write(f"{'':>24}{'page p50':>11}{'page p95':>11}{'page max':>11}{'webcam fps':>12}")
+            self._report('no webcam load', asyncio.run(
+                self._asgi_load('process_webcam_frame_async', 0, duration, options['page_interval'])
+            ))
+            self._report(f"WSGI, {options['workers']} sync workers", self._wsgi_load(
+                sessions, duration, options['page_interval'], options['workers']
+            ))
+            self._report('ASGI, sync view', asyncio.run(
+                self._asgi_load('process_webcam_frame', sessions, duration, options['page_interval'])
+            ))
+            self._report('ASGI, async view', asyncio.run(
+                self._asgi_load('process_webcam_frame_async', sessions, duration, options['page_interval'])
+            ))
+
+    def _frame_body(self, client_id):
+        return json.dumps({'frame': self.frame, 'mode': 'detections', 'client': client_id})
+
+    def _pause(self, reply, frames, started):
+        """Count a processed frame; seconds to wait before the next one, as the webcam page does"""
+        if reply.get('success'):
+            frames[0] += 1
+        interval = reply.get('recommended_interval_ms', settings.WEBCAM_MIN_INTERVAL_MS) / 1000
+        return max(0.0, interval - (time.perf_counter() - started))
+
+    def _wsgi_load(self, sessions, duration, page_interval, workers):
+        """Every request, page or frame, waits for one of `workers` threads, like gunicorn sync workers"""
+        pool = ThreadPoolExecutor(workers)
+        local = threading.local()
+        deadline = time.perf_counter() + duration
+        frames = [0]
+
+        def request(method, url, body=None):
+            if not hasattr(local, 'client'):
+                local.client = Client(HTTP_HOST='localhost')
+                local.client.cookies[settings.SESSION_COOKIE_NAME] = self.cookie.split('=', 1)[1]
+            if method == 'POST':
+                return local.client.post(url, data=body, content_type='application/json').content
+            return local.client.get(url).content
+
+        def webcam(index):
+            url, body = reverse('process_webcam_frame'), self._frame_body(f'wsgi-{index}')
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                reply = json.loads(pool.submit(request, 'POST', url, body).result())
+                time.sleep(self._pause(reply, frames, started))
+
+        browsers = [threading.Thread(target=webcam, args=(index,)) for index in range(sessions)]
+        for browser in browsers:
+            browser.start()
+        latencies = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            pool.submit(request, 'GET', self.page_url).result()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(max(0.0, page_interval - latencies[-1]))
+        for browser in browsers:
+            browser.join()
+        pool.shutdown()
+        return latencies, frames[0] / duration
+
+    async def _asgi_load(self, view_name, sessions, duration, page_interval):
+        from prj_file_proceed.asgi import application
+
+        url = reverse(view_name)
+        deadline = time.perf_counter() + duration
+        frames = [0]
+
+        async def webcam(index):
+            body = self._frame_body(f'{view_name}-{index}').encode()
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                _, content = await _asgi_request(application, 'POST', url, self.cookie, body)
+                await asyncio.sleep(self._pause(json.loads(content), frames, started))
+
+        async def pages():
+            latencies = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                status, _ = await _asgi_request(application, 'GET', self.page_url, self.cookie)
+                if status != 200:
+                    raise CommandError(f"Page request failed with status {status}")
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(max(0.0, page_interval - latencies[-1]))
+            return latencies
+
+        latencies, *_ = await asyncio.gather(pages(), *(webcam(index) for index in range(sessions)))
+        return latencies, frames[0] / duration
+
+    def _report(self, name, measurement):
+        latencies, fps = measurement
+        self.stdout.write(
+            f"{name:>24}{percentile(latencies, 50) * 1000:8.1f} ms{percentile(latencies, 95) * 1000:8.1f} ms"
+            f"{max(latencies) * 1000:8.1f} ms{fps:12.1f}"
+        )
@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from video_detection.benchmarking import make_synthetic_video
+from video_detection.yolo_service import YOLODetectionService
+
+
+class Command(BaseCommand):
+    help = 'Measure video detection throughput (frames/second) for several batch sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', help='Video file to use (default: generate a synthetic one)')
+        parser.add_argument('--frames', type=int, default=300, help='Frames in the synthetic video')
+        parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+        parser.add_argument('--sample-every', type=int, default=5)
+
+    def handle(self, *args, **options):
+        import cv2
+
+        video_path = options['video'] or make_synthetic_video(frames=options['frames'])
+        batch_sizes = [int(b) for b in options['batch_sizes'].split(',')]
+
+        # Decode the sampled frames once so only inference is compared
+        cap = cv2.VideoCapture(video_path)
+        frames = []
+        frame_count = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_count % options['sample_every'] == 0:
+                frames.append(frame)
+            frame_count += 1
+        cap.release()
+        if not options['video']:
+            os.remove(video_path)
+
+        service = YOLODetectionService()
+        service.detect_objects(frames[0])  # load and warm up outside the timing
+
+        self.stdout.write(f"{len(frames)} sampled frames from {frame_count} decoded")
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            for i in range(0, len(frames), batch_size):
+                service.detect_batch(frames[i:i + batch_size])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"batch {batch_size:>3}: {len(frames) / elapsed:7.2f} frames/s "
+                f"({elapsed * 1000 / len(frames):6.1f} ms/frame)"
+            )
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from prj_file_proceed.metrics import percentile
+from video_detection.batching import BatchingInferenceServer
+from video_detection.yolo_service import YOLODetectionService
+
+
+class Command(BaseCommand):
+    help = ('Compare per-request batch-of-one inference with the cross-session batching server '
+            'at several numbers of concurrent webcam clients (throughput and p50/p99 latency)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,2,4,8', help='Concurrent clients to simulate')
+        parser.add_argument('--frames', type=int, default=20, help='Frames sent by each client')
+        parser.add_argument('--max-batch', type=int, default=None, help='Default: WEBCAM_MAX_BATCH')
+        parser.add_argument('--max-wait-ms', type=float, default=None, help='Default: WEBCAM_MAX_BATCH_WAIT_MS')
+        parser.add_argument('--width', type=int, default=640)
+        parser.add_argument('--height', type=int, default=480)
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        frames = [
+            rng.integers(0, 255, size=(options['height'], options['width'], 3), dtype=np.uint8)
+            for _ in range(8)
+        ]
+        service = YOLODetectionService()
+        service.detect_batch_arrays(frames[:1])  # load and warm up outside the timing
+        server = BatchingInferenceServer(max_batch=options['max_batch'], max_wait_ms=options['max_wait_ms'])
+        server.detect(frames[0])
+
+        self.stdout.write(
+            f"max batch {server.max_batch}, max wait {server.max_wait * 1000:.1f} ms, "
+            f"{options['frames']} frames per client ({settings.YOLO_MODEL})"
+        )
+        for clients in [int(c) for c in options['concurrency'].split(',')]:
+            for name, detect in (('per-request', lambda f: service.detect_batch_arrays([f])[0]),
+                                 ('batched', server.detect)):
+                batches_before, frames_before = server.batches, server.frames
+                latencies, elapsed = self._run_clients(detect, frames, clients, options['frames'])
+                extra = ''
+                if name == 'batched' and server.batches > batches_before:
+                    extra = f", avg batch {(server.frames - frames_before) / (server.batches - batches_before):.1f}"
+                self.stdout.write(
+                    f"{clients:>3} clients {name:>11}: {len(latencies) / elapsed:7.2f} frames/s, "
+                    f"p50 {percentile(latencies, 50) * 1000:7.1f} ms, "
+                    f"p99 {percentile(latencies, 99) * 1000:7.1f} ms{extra}"
+                )
+
+    def _run_clients(self, detect, frames, clients, frames_per_client):
+        latencies = []
+        lock = threading.Lock()
+
+        def client(index):
+            for i in range(frames_per_client):
+                frame = frames[(index + i) % len(frames)]
+                started = time.perf_counter()
+                detect(frame)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, time.perf_counter() - started
@@ -0,0 +1,112 @@
+import asyncio
+import base64
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from prj_file_proceed.metrics import percentile
+from video_detection.benchmarking import make_synthetic_video, throwaway_database
+from video_detection.websocket import FRAME_ID_BYTES, WEBCAM_WS_PATH
+
+
+class Command(BaseCommand):
+    help = ('Compare per-frame latency, server time and payload size of the HTTP/base64 webcam '
+            'endpoint (annotated and detections-only modes) and the binary WebSocket stream '
+            '(in-process, against a throwaway database)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=50)
+        parser.add_argument('--width', type=int, default=640)
+        parser.add_argument('--height', type=int, default=480)
+        parser.add_argument('--quality', type=int, default=80, help='JPEG quality, like canvas.toBlob(…, 0.8)')
+
+    def handle(self, *args, **options):
+        import cv2
+
+        video_path = make_synthetic_video(frames=options['frames'], width=options['width'], height=options['height'])
+        cap = cv2.VideoCapture(video_path)
+        jpegs = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            jpegs.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, options['quality']])[1].tobytes())
+        cap.release()
+        os.remove(video_path)
+
+        with throwaway_database():
+            user = User.objects.create(username='benchmark')
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+            response = client.post(reverse('process_webcam_frame'), data=json.dumps({'frame': self._data_url(jpegs[0])}),
+                                   content_type='application/json')  # load and warm up the model outside the timing
+            if not response.json().get('success'):
+                raise CommandError(f"Webcam endpoint failed: {response.content[:200]}")
+
+            self.stdout.write(f"{len(jpegs)} frames {options['width']}x{options['height']}, "
+                              f"avg JPEG {sum(map(len, jpegs)) / len(jpegs) / 1024:.1f} KB")
+            self._report('HTTP annotated', self._http(client, jpegs, 'annotated'))
+            self._report('HTTP detections', self._http(client, jpegs, 'detections'))
+            self._report('WebSocket binary', asyncio.run(self._websocket(cookie, jpegs)))
+
+    def _data_url(self, jpeg):
+        return 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode()
+
+    def _http(self, client, jpegs, mode):
+        latencies, server_times, sent, received = [], [], 0, 0
+        url = reverse('process_webcam_frame')
+        for jpeg in jpegs:
+            body = json.dumps({'frame': self._data_url(jpeg), 'mode': mode})
+            started = time.perf_counter()
+            response = client.post(url, data=body, content_type='application/json')
+            latencies.append(time.perf_counter() - started)
+            server_times.append(response.json()['server_ms'] / 1000)
+            sent += len(body)
+            received += len(response.content)
+        return latencies, server_times, sent, received
+
+    async def _websocket(self, cookie, jpegs):
+        from prj_file_proceed.asgi import application
+
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        scope = {
+            'type': 'websocket',
+            'path': WEBCAM_WS_PATH,
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        }
+        handler = asyncio.create_task(application(scope, inbox.get, outbox.put))
+        await inbox.put({'type': 'websocket.connect'})
+        accepted = await outbox.get()
+        if accepted['type'] != 'websocket.accept':
+            raise RuntimeError(f"WebSocket rejected: {accepted}")
+
+        latencies, server_times, sent, received = [], [], 0, 0
+        for frame_id, jpeg in enumerate(jpegs):
+            started = time.perf_counter()
+            await inbox.put({'type': 'websocket.receive', 'bytes': frame_id.to_bytes(FRAME_ID_BYTES, 'big') + jpeg})
+            reply = await outbox.get()
+            latencies.append(time.perf_counter() - started)
+            server_times.append(json.loads(reply['text'])['ms'] / 1000)
+            sent += len(jpeg)
+            received += len(reply['text'])
+        await inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await handler
+        return latencies, server_times, sent, received
+
+    def _report(self, name, measurement):
+        latencies, server_times, sent, received = measurement
+        count = len(latencies)
+        self.stdout.write(
+            f"{name:>18}: p50 {percentile(latencies, 50) * 1000:6.1f} ms, "
+            f"p95 {percentile(latencies, 95) * 1000:6.1f} ms, "
+            f"server p50 {percentile(server_times, 50) * 1000:6.1f} ms, "
+            f"up {sent / count / 1024:6.1f} KB/frame, down {received / count / 1024:6.1f} KB/frame"
+        )
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from prj_file_proceed.metrics import percentile
+from video_detection.benchmarking import make_synthetic_video, map50
+
+# Set by the parent before forking so frames are inherited instead of pickled
+_FRAMES = []
+
+
+def _run_backend(variant, backend, int8, batch_size):
+    """Load one backend in a fresh process and time it; returns stats and detections"""
+    from ultralytics import YOLO
+
+    from video_detection.backends import resolve_model
+    from video_detection.detections import FrameDetections
+    from video_detection.model_registry import _rss_mb
+
+    frames = _FRAMES
+    path = resolve_model(variant, backend, int8)  # export (if needed) before measuring memory
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    model = YOLO(path, task='detect')
+    predict = dict(conf=settings.YOLO_CONFIDENCE, iou=settings.YOLO_IOU, imgsz=settings.YOLO_IMGSZ, verbose=False)
+    model(frames[0], **predict)
+    load_time = time.perf_counter() - started
+
+    latencies = []
+    detections = []
+    for frame in frames:
+        started = time.perf_counter()
+        results = model(frame, **predict)
+        latencies.append(time.perf_counter() - started)
+        detections.extend(FrameDetections.from_results(results, model.names))
+
+    started = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        model(frames[i:i + batch_size], **predict)
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        'path': path,
+        'load_s': load_time,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'fps': len(frames) / batch_elapsed,
+        'rss_mb': _rss_mb() - rss_before,
+        'detections': [(d.xyxy, d.conf, d.cls) for d in detections],
+        'names': model.names,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Compare YOLO inference backends (PyTorch, ONNX Runtime, OpenVINO, optional INT8) '
+            'on latency, throughput, memory and mAP50 drift against PyTorch')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', help='Video file to use (default: generate a synthetic one)')
+        parser.add_argument('--frames', type=int, default=64, help='Frames to sample from the video')
+        parser.add_argument('--model', default=None, help='PyTorch weights (default: YOLO_MODEL)')
+        parser.add_argument('--backends', default='torch,onnx,openvino')
+        parser.add_argument('--int8', action='store_true', help='Also run INT8 exports of the non-torch backends')
+        parser.add_argument('--batch-size', type=int, default=None, help='Default: YOLO_BATCH_SIZE')
+
+    def handle(self, *args, **options):
+        import cv2
+
+        from video_detection.detections import FrameDetections
+
+        variant = options['model'] or settings.YOLO_MODEL
+        batch_size = options['batch_size'] or settings.YOLO_BATCH_SIZE
+        video_path = options['video'] or make_synthetic_video(frames=options['frames'] * 2)
+
+        # Evenly spaced frames, decoded once and shared with every backend process
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or options['frames']
+        frames = _FRAMES
+        frames.clear()
+        for index in range(options['frames']):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index * total // options['frames'])
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if not options['video']:
+            os.remove(video_path)
+
+        runs = []
+        for backend in options['backends'].split(','):
+            runs.append((backend, False))
+            if options['int8'] and backend != 'torch':
+                runs.append((backend, True))
+        if ('torch', False) in runs:
+            runs.remove(('torch', False))
+        runs.insert(0, ('torch', False))  # reference for drift
+
+        # fork: each backend starts from the same clean parent, so RSS deltas are comparable
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f"{len(frames)} frames, batch {batch_size}, model {variant}")
+        self.stdout.write(f"{'backend':<16}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'batch fps':>11}"
+                          f"{'RSS MB':>9}{'dets':>7}{'mAP50 vs torch':>16}")
+        reference = None
+        for backend, int8 in runs:
+            with context.Pool(1) as pool:
+                result = pool.apply(_run_backend, (variant, backend, int8, batch_size))
+            detections = [FrameDetections(xyxy, conf, cls, result['names']) for xyxy, conf, cls in result['detections']]
+            if reference is None:
+                reference = detections
+            drift = map50(detections, reference)
+            label = backend + (' int8' if int8 else '')
+            self.stdout.write(
+                f"{label:<16}{result['load_s']:8.2f}{result['p50_ms']:9.1f}{result['p95_ms']:9.1f}"
+                f"{result['fps']:11.2f}{result['rss_mb']:9.1f}{sum(len(d) for d in detections):7d}"
+                f"{'n/a' if drift is None else f'{drift:.3f}':>16}"
+            )
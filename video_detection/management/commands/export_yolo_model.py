@@ -0,0 +1,70 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from video_detection.backends import calibration_images, export_model, exported_model_path
+
+
+class Command(BaseCommand):
+    help = ('Export the YOLO model to ONNX or OpenVINO IR (optionally INT8), '
+            'collecting calibration frames from local videos first')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=['onnx', 'openvino'], default=None,
+                            help='Default: YOLO_BACKEND')
+        parser.add_argument('--model', default=None, help='PyTorch weights (default: YOLO_MODEL)')
+        parser.add_argument('--imgsz', type=int, default=None, help='Default: YOLO_IMGSZ')
+        parser.add_argument('--int8', action='store_true', help='Quantize to INT8')
+        parser.add_argument('--calibration-video', action='append', default=[],
+                            help='Video to take calibration frames from (repeatable)')
+        parser.add_argument('--calibration-frames', type=int, default=64,
+                            help='Frames to extract per calibration video')
+        parser.add_argument('--force', action='store_true', help='Re-export even if the export exists')
+
+    def handle(self, *args, **options):
+        backend = options['backend'] or settings.YOLO_BACKEND
+        if backend == 'torch':
+            raise CommandError("Nothing to export for the torch backend; pass --backend onnx or openvino")
+        variant = options['model'] or settings.YOLO_MODEL
+        imgsz = options['imgsz'] or settings.YOLO_IMGSZ
+
+        for video in options['calibration_video']:
+            count = self._extract_frames(video, options['calibration_frames'])
+            self.stdout.write(f"Saved {count} calibration frames from {video}")
+        if options['int8']:
+            self.stdout.write(f"Calibrating on {len(calibration_images())} images in {settings.YOLO_CALIBRATION_DIR}")
+
+        target = exported_model_path(variant, backend, options['int8'], imgsz)
+        if os.path.exists(target) and not options['force']:
+            self.stdout.write(f"{target} already exists (use --force to re-export)")
+            return
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        try:
+            path = export_model(variant, backend, int8=options['int8'], imgsz=imgsz)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Exported {variant} -> {path}"))
+
+    def _extract_frames(self, video, count):
+        """Write `count` evenly spaced frames of video into YOLO_CALIBRATION_DIR"""
+        import cv2
+
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise CommandError(f"Cannot open video: {video}")
+        os.makedirs(settings.YOLO_CALIBRATION_DIR, exist_ok=True)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+        stem = os.path.splitext(os.path.basename(video))[0]
+        saved = 0
+        for index in range(count):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index * total // count)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cv2.imwrite(os.path.join(settings.YOLO_CALIBRATION_DIR, f'{stem}_{index:04d}.jpg'), frame)
+            saved += 1
+        cap.release()
+        return saved
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionresult',
+            name='inherited',
+            field=models.BooleanField(default=False, help_text='Detections copied from the previous analyzed frame (no scene change)'),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='processing_stats',
+            field=models.JSONField(blank=True, default=dict, help_text='Sampling/inference counters for this run'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0002_adaptive_sampling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='storage_mode',
+            field=models.CharField(choices=[('frames', 'Per-frame results + tracks'), ('tracks', 'Tracks only')], default='frames', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DetectionTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('track_id', models.IntegerField()),
+                ('class_name', models.CharField(max_length=50)),
+                ('first_frame', models.IntegerField()),
+                ('last_frame', models.IntegerField()),
+                ('first_timestamp', models.FloatField(help_text='First seen, in seconds')),
+                ('last_timestamp', models.FloatField(help_text='Last seen, in seconds')),
+                ('max_confidence', models.FloatField()),
+                ('hits', models.IntegerField(help_text='Number of analyzed frames the object was detected in')),
+                ('trajectory', models.JSONField(default=list, help_text='Sampled [timestamp, x1, y1, x2, y2] points')),
+                ('video_detection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='video_detection.videodetection')),
+            ],
+            options={
+                'ordering': ['first_frame', 'track_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0003_detection_tracks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videodetection',
+            name='storage_mode',
+            field=models.CharField(choices=[('frames', 'Per-frame results + tracks'), ('tracks', 'Tracks only'), ('columnar', 'Columnar archive + tracks')], default='frames', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DetectionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='detections/')),
+                ('detection_count', models.IntegerField(default=0)),
+                ('frame_count', models.IntegerField(default=0, help_text='Analyzed frames, including frames without detections')),
+                ('duration', models.FloatField(default=0, help_text='Timestamp of the last analyzed frame, in seconds')),
+                ('class_names', models.JSONField(default=dict, help_text='{class_id: class_name} for ids used in the file')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('video_detection', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='video_detection.videodetection')),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    """Compute the counters once for videos processed before they existed"""
+    VideoDetection = apps.get_model('video_detection', 'VideoDetection')
+    DetectionResult = apps.get_model('video_detection', 'DetectionResult')
+    for video_id in DetectionResult.objects.values_list('video_detection_id', flat=True).distinct():
+        summary = {}
+        for detections in DetectionResult.objects.filter(video_detection_id=video_id).values_list('detections', flat=True).iterator():
+            for detection in detections:
+                obj_class = detection.get('class', 'unknown')
+                summary[obj_class] = summary.get(obj_class, 0) + 1
+        VideoDetection.objects.filter(id=video_id).update(
+            object_summary=summary, total_detections=sum(summary.values())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0004_detection_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='object_summary',
+            field=models.JSONField(blank=True, default=dict, help_text='{class_name: count} across all stored frames'),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='total_detections',
+            field=models.IntegerField(default=0, help_text='Detections across all stored frames, updated as results are written'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0005_detection_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='profile',
+            field=models.CharField(default='balanced', help_text='Detection profile (YOLO_PROFILES) used for this run', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='profile_settings',
+            field=models.JSONField(blank=True, default=dict, help_text='Model, imgsz, conf, classes and stride the profile resolved to'),
+        ),
+    ]
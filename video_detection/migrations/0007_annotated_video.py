@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0006_detection_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='annotated_video',
+            field=models.FileField(blank=True, null=True, upload_to='annotated/'),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='render_annotated',
+            field=models.BooleanField(default=False, help_text='Also render an MP4 with boxes and labels drawn on every frame'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0007_annotated_video'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detectionresult',
+            index=models.Index(fields=['video_detection', 'frame_number'], name='video_detec_video_d_7fe826_idx'),
+        ),
+    ]
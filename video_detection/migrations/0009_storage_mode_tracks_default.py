@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0008_detection_result_frame_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videodetection',
+            name='storage_mode',
+            field=models.CharField(choices=[('frames', 'Per-frame results + tracks'), ('tracks', 'Tracks only'), ('columnar', 'Columnar archive + tracks')], default='tracks', max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_detection', '0009_storage_mode_tracks_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videodetection',
+            name='object_summary',
+            field=models.JSONField(blank=True, default=dict, help_text='{class_name: count} across all analyzed frames'),
+        ),
+        migrations.AlterField(
+            model_name='videodetection',
+            name='total_detections',
+            field=models.IntegerField(default=0, help_text='Detections across all analyzed frames (inherited rows not counted)'),
+        ),
+    ]
@@ -0,0 +1,139 @@
+import os
+import resource
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from prj_file_proceed.metrics import percentile
+
+
+def _rss_mb():
+    """Current resident memory of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to peak RSS (KB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded YOLO models.
+
+    Each model variant is loaded (and warmed up) once per worker process and
+    shared by every request and background thread in it (exports for other
+    backends once per input size as well, see key()). Ultralytics
+    predictors keep per-call state, so callers hold inference_lock(key)
+    around each model call.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._load_locks = {}
+        self._inference_locks = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _variant_lock(self, variant):
+        with self._lock:
+            return self._load_locks.setdefault(variant, threading.Lock())
+
+    def inference_lock(self, variant=None):
+        variant = variant or settings.YOLO_MODEL
+        with self._lock:
+            return self._inference_locks.setdefault(variant, threading.Lock())
+
+    def key(self, variant=None, imgsz=None):
+        """Cache key of a model: PyTorch weights serve any input size, exports are built for one"""
+        variant = variant or settings.YOLO_MODEL
+        imgsz = imgsz or settings.YOLO_IMGSZ
+        exported_on_load = settings.YOLO_BACKEND != 'torch' and variant.endswith(('.pt', '.yaml'))
+        if not exported_on_load or imgsz == settings.YOLO_IMGSZ:
+            return variant
+        return f'{variant}@{imgsz}'
+
+    def get(self, variant=None, imgsz=None):
+        """Return the loaded model for variant (at imgsz), loading it on first use"""
+        key = self.key(variant, imgsz)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._variant_lock(key):
+            # Another thread may have finished loading while we waited
+            if key not in self._models:
+                self._models[key] = self._load(key, variant or settings.YOLO_MODEL, imgsz or settings.YOLO_IMGSZ)
+            return self._models[key]
+
+    def _load(self, key, variant, imgsz):
+        try:
+            import numpy as np
+            from ultralytics import YOLO
+        except ImportError as e:
+            raise ImportError(f"Required packages not installed: {e}")
+
+        from .backends import resolve_model
+
+        # Exports to ONNX/OpenVINO on first use when YOLO_BACKEND asks for it
+        path = resolve_model(variant, imgsz=imgsz)
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        model = YOLO(path, task='detect')
+        load_time = time.perf_counter() - started
+
+        warmup_time = None
+        if settings.YOLO_WARMUP:
+            # First inference pays for kernel selection and lazy allocations
+            started = time.perf_counter()
+            model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+            warmup_time = time.perf_counter() - started
+
+        with self._lock:
+            self._stats[key] = {
+                'path': path,
+                'imgsz': imgsz,
+                'load_time_s': round(load_time, 3),
+                'warmup_time_s': round(warmup_time, 3) if warmup_time is not None else None,
+                'memory_delta_mb': round(_rss_mb() - rss_before, 1),
+                'latencies': deque(maxlen=500),
+                'inference_count': 0,
+            }
+        print(f"Loaded YOLO model {path} in {load_time:.2f}s (pid {os.getpid()})")
+        return model
+
+    def preload(self, variants=None):
+        """Load models ahead of the first request, e.g. at worker boot"""
+        for variant in variants or [settings.YOLO_MODEL]:
+            self.get(variant)
+
+    def record_inference(self, variant, seconds, frames=1):
+        """Record one model call covering `frames` frames"""
+        variant = variant or settings.YOLO_MODEL
+        with self._lock:
+            stats = self._stats.get(variant)
+            if stats is None:
+                return
+            stats['inference_count'] += frames
+            stats['latencies'].append(seconds / frames)
+
+    def stats(self):
+        """Load time, memory and per-frame inference latency for each model"""
+        models = {}
+        with self._lock:
+            for variant, stats in self._stats.items():
+                latencies = stats['latencies']
+                data = {k: v for k, v in stats.items() if k != 'latencies'}
+                if latencies:
+                    data['inference_avg_ms'] = round(sum(latencies) / len(latencies) * 1000, 1)
+                    data['inference_p95_ms'] = round(percentile(latencies, 95) * 1000, 1)
+                models[variant] = data
+        return {
+            'pid': os.getpid(),
+            'process_rss_mb': round(_rss_mb(), 1),
+            'models': models,
+        }
+
+
+registry = ModelRegistry()
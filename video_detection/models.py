@@ -18,6 +18,18 @@ class VideoDetection(models.Model):
     ])
     total_frames = models.IntegerField(default=0)
     processed_frames = models.IntegerField(default=0)
+    storage_mode = models.CharField(max_length=20, default='tracks', choices=[
+        ('frames', 'Per-frame results + tracks'),
+        ('tracks', 'Tracks only'),
+        ('columnar', 'Columnar archive + tracks'),
+    ])
+    processing_stats = models.JSONField(default=dict, blank=True, help_text='Sampling/inference counters for this run')
+    total_detections = models.IntegerField(default=0, help_text='Detections across all analyzed frames (inherited rows not counted)')
+    object_summary = models.JSONField(default=dict, blank=True, help_text='{class_name: count} across all analyzed frames')
+    profile = models.CharField(max_length=50, default='balanced', help_text='Detection profile (YOLO_PROFILES) used for this run')
+    profile_settings = models.JSONField(default=dict, blank=True, help_text='Model, imgsz, conf, classes and stride the profile resolved to')
+    render_annotated = models.BooleanField(default=False, help_text='Also render an MP4 with boxes and labels drawn on every frame')
+    annotated_video = models.FileField(upload_to='annotated/', blank=True, null=True)
     
     def __str__(self):
         if self.video_file:
@@ -32,6 +44,7 @@ class DetectionResult(models.Model):
     frame_number = models.IntegerField()
     timestamp = models.FloatField(help_text='Timestamp in seconds')
     detections = models.JSONField(default=list, help_text='List of detected objects')
+    inherited = models.BooleanField(default=False, help_text='Detections copied from the previous analyzed frame (no scene change)')
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -46,4 +59,46 @@ class DetectionResult(models.Model):
         return summary
     
     class Meta:
-        ordering = ['frame_number']
\ No newline at end of file
+        ordering = ['frame_number']
+        indexes = [models.Index(fields=['video_detection', 'frame_number'])]
+
+class DetectionTrack(models.Model):
+    """One object followed across frames, stored once instead of per frame"""
+    video_detection = models.ForeignKey(VideoDetection, on_delete=models.CASCADE, related_name='tracks')
+    track_id = models.IntegerField()
+    class_name = models.CharField(max_length=50)
+    first_frame = models.IntegerField()
+    last_frame = models.IntegerField()
+    first_timestamp = models.FloatField(help_text='First seen, in seconds')
+    last_timestamp = models.FloatField(help_text='Last seen, in seconds')
+    max_confidence = models.FloatField()
+    hits = models.IntegerField(help_text='Number of analyzed frames the object was detected in')
+    trajectory = models.JSONField(default=list, help_text='Sampled [timestamp, x1, y1, x2, y2] points')
+    
+    def __str__(self):
+        return f"Track {self.track_id} - {self.class_name}"
+    
+    @property
+    def duration(self):
+        return self.last_timestamp - self.first_timestamp
+    
+    class Meta:
+        ordering = ['first_frame', 'track_id']
+
+class DetectionArchive(models.Model):
+    """Index row for a video's detections stored as a columnar .npy file"""
+    video_detection = models.OneToOneField(VideoDetection, on_delete=models.CASCADE, related_name='archive')
+    file = models.FileField(upload_to='detections/')
+    detection_count = models.IntegerField(default=0)
+    frame_count = models.IntegerField(default=0, help_text='Analyzed frames, including frames without detections')
+    duration = models.FloatField(default=0, help_text='Timestamp of the last analyzed frame, in seconds')
+    class_names = models.JSONField(default=dict, help_text='{class_id: class_name} for ids used in the file')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Archive for {self.video_detection} - {self.detection_count} detections"
+    
+    def load(self, mmap=True):
+        """Open the archive as ColumnarDetections (memory-mapped by default)"""
+        from .archive import ColumnarDetections
+        return ColumnarDetections.open(self.file.path, self.class_names, mmap=mmap)
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+# More chunks than workers keeps every core busy until the end and lets the
+# parent store the first results long before the last chunk is done
+CHUNKS_PER_WORKER = 4
+
+_CHUNK_END = None  # frames_done of the last progress message of a chunk
+
+_progress_queue = None
+
+
+def frame_ranges(total_frames, chunks, stride):
+    """Split [0, total_frames) into at most `chunks` ranges that start on the stride grid"""
+    size = -(-total_frames // max(1, chunks))  # ceil
+    size = max(stride, -(-size // stride) * stride)
+    return [(start, min(start + size, total_frames)) for start in range(0, total_frames, size)]
+
+
+def _init_worker(progress_queue, threads):
+    global _progress_queue
+    import django
+    import torch
+
+    django.setup()  # spawned workers start from a fresh interpreter
+    torch.set_num_threads(threads)  # share the cores instead of each worker claiming all of them
+    _progress_queue = progress_queue
+
+
+def _detect_chunk(path, index, start_frame, end_frame, profile, model_variant):
+    from .yolo_service import YOLODetectionService
+
+    service = YOLODetectionService(model_variant=model_variant, profile=profile)
+    result = service.detect_frame_range(
+        path, start_frame, end_frame,
+        progress=lambda frames_done, entries: _progress_queue.put((index, frames_done, entries))
+    )
+    # The result may reach the parent before the queued entries; this marks the last of them
+    _progress_queue.put((index, _CHUNK_END, []))
+    return result
+
+
+def detect_chunks(path, ranges, profile, model_variant, workers, on_progress=None):
+    """Detect each (start_frame, end_frame) range of a video in a pool of worker processes.
+
+    Every worker opens its own capture, seeks to its range and loads its own
+    model, so decoding and inference both scale with cores. Yields
+    (entries, frames_read, sampling) tuples in frame order: workers send the
+    entries of every batch, and those of the earliest unfinished range are
+    yielded as they arrive (with frames_read 0 and sampling None), while
+    later ranges wait for it. Each range ends with a tuple carrying its
+    frames_read and sampling. on_progress(frames_done) gets the exact
+    number of frames covered across all ranges.
+    """
+    context = multiprocessing.get_context(settings.VIDEO_PARALLEL_START_METHOD)
+    progress_queue = context.Queue()
+    done = [0] * len(ranges)
+    pending = [[] for _ in ranges]  # entries received and not yielded yet
+    ended = [False] * len(ranges)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    def drain(timeout):
+        try:
+            index, frames_done, entries = progress_queue.get(timeout=timeout)
+            while True:
+                if frames_done is _CHUNK_END:
+                    ended[index] = True
+                else:
+                    done[index] = frames_done
+                    pending[index].extend(entries)
+                index, frames_done, entries = progress_queue.get_nowait()
+        except queue.Empty:
+            pass
+        if on_progress:
+            on_progress(sum(done))
+
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(progress_queue, threads)) as pool:
+        futures = [
+            pool.submit(_detect_chunk, path, index, start_frame, end_frame, profile, model_variant)
+            for index, (start_frame, end_frame) in enumerate(ranges)
+        ]
+        try:
+            for index, future in enumerate(futures):
+                while True:
+                    if pending[index]:
+                        entries, pending[index] = pending[index], []
+                        yield entries, 0, None
+                    if future.done() and (ended[index] or future.exception() is not None):
+                        break
+                    drain(timeout=0.5)
+                _, frames_read, sampling = future.result()
+                done[index] = frames_read
+                yield [], frames_read, sampling
+        finally:
+            for future in futures:
+                future.cancel()
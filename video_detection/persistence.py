@@ -0,0 +1,141 @@
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .models import DetectionArchive, DetectionResult, DetectionTrack
+
+
+class DetectionResultBuffer:
+    """Collect DetectionResult rows and write them with bulk_create.
+
+    One INSERT per flush instead of one per sampled frame keeps SQLite's
+    write lock free for other users while a long video is processed. The
+    video's total_detections/object_summary are updated in the same
+    transaction, so the detail page never has to aggregate the rows. Like
+    the columnar archive they count the detections of analyzed frames;
+    inherited rows repeat those and are not counted again.
+
+    Rows are written every flush_size rows, and by flush_if_due() once the
+    oldest unwritten row is max_age seconds old, so the live feed keeps
+    moving when few rows are produced.
+    """
+
+    def __init__(self, video_detection, flush_size=None, max_age=None):
+        self.video_detection = video_detection
+        self.flush_size = flush_size or settings.VIDEO_RESULT_FLUSH_SIZE
+        self.max_age = settings.VIDEO_PROGRESS_INTERVAL if max_age is None else max_age
+        self.rows = []
+        self.pending_summary = {}
+        self.pending_since = None
+
+    def add(self, frame_number, timestamp, detections, inherited=False):
+        if not inherited:
+            for detection in detections:
+                obj_class = detection.get('class', 'unknown')
+                self.pending_summary[obj_class] = self.pending_summary.get(obj_class, 0) + 1
+        if not self.rows:
+            self.pending_since = time.monotonic()
+        self.rows.append(DetectionResult(
+            video_detection=self.video_detection,
+            frame_number=frame_number,
+            timestamp=timestamp,
+            detections=detections,
+            inherited=inherited
+        ))
+        if len(self.rows) >= self.flush_size:
+            self.flush()
+
+    def flush_if_due(self):
+        """Flush if the oldest buffered row has waited max_age seconds"""
+        if self.rows and time.monotonic() - self.pending_since >= self.max_age:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        video_detection = self.video_detection
+        summary = dict(video_detection.object_summary)
+        for obj_class, count in self.pending_summary.items():
+            summary[obj_class] = summary.get(obj_class, 0) + count
+        with transaction.atomic():
+            DetectionResult.objects.bulk_create(self.rows, batch_size=500)
+            video_detection.object_summary = summary
+            video_detection.total_detections = sum(summary.values())
+            video_detection.save(update_fields=['object_summary', 'total_detections'])
+        self.rows = []
+        self.pending_summary = {}
+
+
+class ProgressReporter:
+    """Write processed_frames only when enough time or progress has passed"""
+
+    def __init__(self, video_detection, min_interval=None, min_percent=None):
+        self.video_detection = video_detection
+        self.min_interval = settings.VIDEO_PROGRESS_INTERVAL if min_interval is None else min_interval
+        self.min_percent = settings.VIDEO_PROGRESS_PERCENT if min_percent is None else min_percent
+        self.last_frames = video_detection.processed_frames
+        self.last_time = time.monotonic()
+
+    def update(self, processed_frames, force=False):
+        if processed_frames == self.last_frames:
+            return
+        now = time.monotonic()
+        total = self.video_detection.total_frames
+        step = self.min_percent / 100.0 * total if total else None
+        if not force and now - self.last_time < self.min_interval and (
+            step is None or processed_frames - self.last_frames < step
+        ):
+            return
+        self.video_detection.processed_frames = processed_frames
+        self.video_detection.save(update_fields=['processed_frames'])
+        self.last_frames = processed_frames
+        self.last_time = now
+
+
+def save_tracks(video_detection, tracks):
+    """Bulk-insert the finished tracks of an IoUTracker"""
+    rows = [
+        DetectionTrack(
+            video_detection=video_detection,
+            track_id=track.track_id,
+            class_name=track.class_name,
+            first_frame=track.first_frame,
+            last_frame=track.last_frame,
+            first_timestamp=track.first_timestamp,
+            last_timestamp=track.last_timestamp,
+            max_confidence=track.max_confidence,
+            hits=track.hits,
+            trajectory=track.trajectory
+        )
+        for track in tracks
+    ]
+    with transaction.atomic():
+        DetectionTrack.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def save_summary(video_detection, summary):
+    """Store {class_name: count} over the analyzed frames for modes without a result writer ('tracks')"""
+    video_detection.object_summary = summary
+    video_detection.total_detections = sum(summary.values())
+    video_detection.save(update_fields=['object_summary', 'total_detections'])
+
+
+def save_archive(video_detection, writer):
+    """Write a DetectionArchiveWriter to MEDIA_ROOT/detections/ and index it"""
+    archive = DetectionArchive(
+        video_detection=video_detection,
+        detection_count=sum(len(chunk) for chunk in writer.chunks),
+        frame_count=writer.frame_count,
+        duration=writer.last_timestamp,
+        class_names=writer.names
+    )
+    archive.file.save(f'video_{video_detection.id}.npy', ContentFile(writer.to_bytes()), save=False)
+    with transaction.atomic():
+        archive.save()
+        video_detection.object_summary = writer.class_counts()
+        video_detection.total_detections = archive.detection_count
+        video_detection.save(update_fields=['object_summary', 'total_detections'])
+    return archive
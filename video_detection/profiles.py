@@ -0,0 +1,27 @@
+from django.conf import settings
+
+
+def get_profile(name=None):
+    """Resolved settings of a detection profile (YOLO_PROFILES), with defaults filled in.
+
+    Returns a dict with name, model, imgsz, conf, classes and stride; stride
+    is None when the profile keeps the VIDEO_SAMPLE_* sampling. Raises
+    ValueError for unknown profile names.
+    """
+    name = name or settings.YOLO_DEFAULT_PROFILE
+    if name not in settings.YOLO_PROFILES:
+        raise ValueError(f"Unknown detection profile '{name}', expected one of {', '.join(settings.YOLO_PROFILES)}")
+    profile = {
+        'name': name,
+        'model': settings.YOLO_MODEL,
+        'imgsz': settings.YOLO_IMGSZ,
+        'conf': settings.YOLO_CONFIDENCE,
+        'classes': settings.YOLO_CLASSES,
+        'stride': None,
+    }
+    profile.update(settings.YOLO_PROFILES[name])
+    return profile
+
+
+def profile_choices():
+    return [(name, name.replace('_', ' ').capitalize()) for name in settings.YOLO_PROFILES]
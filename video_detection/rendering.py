@@ -0,0 +1,223 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+
+from .tracking import greedy_match, iou_matrix
+
+_END = object()
+
+# BGR colours, one per class id (modulo)
+PALETTE = np.array([
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255),
+], dtype=np.int32)
+
+
+class BoxInterpolator:
+    """Boxes for every frame of a video from the detections of its analyzed frames.
+
+    keyframes is a list of (frame_number, FrameDetections) in frame order.
+    Between two keyframes, boxes of the same class are paired by IoU and
+    move linearly from one position to the other; unpaired boxes of the
+    earlier keyframe stay until halfway and unpaired boxes of the later one
+    appear from halfway. After the last keyframe its boxes are held.
+    """
+
+    def __init__(self, keyframes, iou_threshold=None):
+        self.keyframes = keyframes
+        self.frame_numbers = np.array([frame_number for frame_number, _ in keyframes], dtype=np.int64)
+        self.iou_threshold = settings.VIDEO_TRACK_IOU if iou_threshold is None else iou_threshold
+        self._segment_index = None
+        self._segment = None
+
+    def _build_segment(self, index):
+        _, start = self.keyframes[index]
+        if index + 1 == len(self.keyframes):
+            return start, None
+        _, end = self.keyframes[index + 1]
+        ious = iou_matrix(start.xyxy, end.xyxy)
+        ious[start.cls[:, None] != end.cls[None, :]] = 0
+        pairs = np.array(greedy_match(ious, self.iou_threshold), dtype=np.int64).reshape(-1, 2)
+        leaving = np.setdiff1d(np.arange(len(start)), pairs[:, 0])
+        arriving = np.setdiff1d(np.arange(len(end)), pairs[:, 1])
+        return start, {
+            'from': start.xyxy[pairs[:, 0]],
+            'to': end.xyxy[pairs[:, 1]],
+            'conf_from': start.conf[pairs[:, 0]],
+            'conf_to': end.conf[pairs[:, 1]],
+            'cls': start.cls[pairs[:, 0]],
+            'leaving': start.select(leaving),
+            'arriving': end.select(arriving),
+        }
+
+    def at(self, frame_number):
+        """(xyxy, conf, cls) arrays for one frame"""
+        index = int(np.searchsorted(self.frame_numbers, frame_number, side='right')) - 1
+        if index < 0:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32)
+        if index != self._segment_index:
+            self._segment_index = index
+            self._segment = self._build_segment(index)
+        start, segment = self._segment
+        if segment is None or frame_number == self.frame_numbers[index]:
+            return start.xyxy, start.conf, start.cls
+
+        t = (frame_number - self.frame_numbers[index]) / (self.frame_numbers[index + 1] - self.frame_numbers[index])
+        unpaired = segment['leaving'] if t < 0.5 else segment['arriving']
+        return (
+            np.concatenate([segment['from'] + (segment['to'] - segment['from']) * t, unpaired.xyxy]),
+            np.concatenate([segment['conf_from'] + (segment['conf_to'] - segment['conf_from']) * t, unpaired.conf]),
+            np.concatenate([segment['cls'], unpaired.cls]),
+        )
+
+
+def draw_boxes(cv2, frame, xyxy, conf, cls, names, thickness=2):
+    """Draw boxes and labels in place: one polylines call per class, then the labels"""
+    if len(xyxy) == 0:
+        return frame
+    boxes = np.round(xyxy).astype(np.int32)
+    corners = np.stack([boxes[:, [0, 1]], boxes[:, [2, 1]], boxes[:, [2, 3]], boxes[:, [0, 3]]], axis=1)
+    colors = PALETTE[cls % len(PALETTE)]
+    for class_id in np.unique(cls):
+        selected = cls == class_id
+        cv2.polylines(frame, list(corners[selected]), True, colors[selected][0].tolist(), thickness)
+    for (x1, y1, _, _), confidence, class_id, color in zip(boxes.tolist(), conf.tolist(), cls.tolist(), colors.tolist()):
+        cv2.putText(frame, f"{names[class_id]} {confidence:.2f}", (x1, max(y1 - 6, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    return frame
+
+
+class FrameWriter:
+    """cv2.VideoWriter fed through a bounded queue on its own thread.
+
+    Encoding overlaps with decoding and drawing in the caller; the queue
+    bound keeps memory flat when the encoder is the slowest stage. The first
+    codec of VIDEO_RENDER_CODECS that the OpenCV build can open is used.
+    """
+
+    def __init__(self, path, fps, size, queue_size=None, codecs=None):
+        import cv2
+
+        self.writer = None
+        for codec in codecs or settings.VIDEO_RENDER_CODECS:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+            if writer.isOpened():
+                self.writer = writer
+                self.codec = codec
+                break
+        if self.writer is None:
+            raise ValueError(f"No usable video codec among {', '.join(codecs or settings.VIDEO_RENDER_CODECS)}")
+        self._queue = queue.Queue(maxsize=queue_size or settings.VIDEO_RENDER_QUEUE_SIZE)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is _END:
+                break
+            if self._error is None:
+                try:
+                    self.writer.write(frame)
+                except Exception as e:
+                    self._error = e
+
+    def write(self, frame):
+        if self._error:
+            raise self._error
+        self._queue.put(frame)
+
+    def close(self):
+        self._queue.put(_END)
+        self._thread.join()
+        self.writer.release()
+        if self._error:
+            raise self._error
+
+
+class AnnotatedVideoRenderer:
+    """Draw keyframe detections on the frames decoded by the detection loop and encode them.
+
+    The loop hands over every decoded frame with hold() and, in frame
+    order, the detections of each analyzed frame with add_keyframe(), so
+    the video is decoded once for both. Held frames wait for the next
+    keyframe, then get boxes interpolated between the two (BoxInterpolator)
+    and go to a FrameWriter; frames after the last keyframe keep its boxes.
+    A failure stops rendering without interrupting detection; finish()
+    raises it.
+    """
+
+    def __init__(self, target_path, fps, max_held=None):
+        import cv2
+
+        self.cv2 = cv2
+        self.target_path = target_path
+        self.fps = fps
+        self.max_held = max_held or settings.VIDEO_RENDER_MAX_HELD
+        self.held = deque()
+        self.writer = None
+        self.codec = None
+        self.error = None
+        self.frames = 0
+        self.seconds = 0.0
+        self._keyframe = None
+        self._names = {}
+
+    def hold(self, frame_number, frame):
+        if self.error is None:
+            self.held.append((frame_number, frame))
+
+    def add_keyframe(self, frame_number, detections):
+        keyframe = (frame_number, detections)
+        self._names = detections.names
+        self._write_until(frame_number, [self._keyframe, keyframe] if self._keyframe else [keyframe])
+        self._keyframe = keyframe
+
+    def _write_until(self, end_frame, keyframes):
+        """Draw and queue the held frames before end_frame (all of them for None)"""
+        if self.error is not None:
+            return
+        started = time.perf_counter()
+        interpolator = BoxInterpolator(keyframes)
+        try:
+            while self.held and (end_frame is None or self.held[0][0] < end_frame):
+                frame_number, frame = self.held.popleft()
+                if self.writer is None:
+                    self.writer = FrameWriter(self.target_path, self.fps, (frame.shape[1], frame.shape[0]))
+                xyxy, conf, cls = interpolator.at(frame_number)
+                self.writer.write(draw_boxes(self.cv2, frame, xyxy, conf, cls, self._names))
+                self.frames += 1
+        except Exception as e:
+            self.error = e
+            self.close()
+        self.seconds += time.perf_counter() - started
+
+    def close(self):
+        """Drop held frames and stop the writer thread (also after a failed detection)"""
+        self.held.clear()
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            self.codec = writer.codec
+            try:
+                writer.close()
+            except Exception as e:
+                self.error = self.error or e
+
+    def finish(self):
+        """Write the remaining frames and close the file; returns render statistics"""
+        started = time.perf_counter()
+        self._write_until(None, [self._keyframe] if self._keyframe else [])
+        self.close()
+        self.seconds += time.perf_counter() - started
+        if self.error is not None:
+            raise self.error
+        if not self.frames:
+            raise ValueError("No frames were decoded")
+        return {'frames': self.frames, 'codec': self.codec, 'seconds': round(self.seconds, 2)}
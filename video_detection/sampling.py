@@ -0,0 +1,51 @@
+from django.conf import settings
+
+
+class MotionSampler:
+    """Decide per frame whether YOLO needs to run, based on scene change.
+
+    Each candidate frame is reduced to a tiny grayscale thumbnail and
+    compared with the thumbnail of the last frame that was analyzed. The
+    model runs when the mean absolute difference passes the threshold, but
+    never more often than min_interval frames and never less often than
+    max_interval frames.
+    """
+
+    SIGNATURE_SIZE = (64, 36)
+
+    def __init__(self, threshold=None, min_interval=None, max_interval=None):
+        import cv2
+        self.cv2 = cv2
+        self.threshold = settings.VIDEO_MOTION_THRESHOLD if threshold is None else threshold
+        self.min_interval = max(1, min_interval or settings.VIDEO_MIN_SAMPLE_INTERVAL)
+        self.max_interval = max(self.min_interval, max_interval or settings.VIDEO_MAX_SAMPLE_INTERVAL)
+        self.last_signature = None
+        self.last_frame_number = None
+        self.inference_frames = 0
+        self.checked_frames = 0
+
+    def _signature(self, frame):
+        cv2 = self.cv2
+        small = cv2.resize(frame, self.SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def should_infer(self, frame_number, frame):
+        self.checked_frames += 1
+        if self.last_signature is not None:
+            since = frame_number - self.last_frame_number
+            if since < self.min_interval:
+                return False
+            signature = self._signature(frame)
+            if since < self.max_interval:
+                change = float(self.cv2.absdiff(signature, self.last_signature).mean())
+                if change < self.threshold:
+                    return False
+        else:
+            signature = self._signature(frame)
+
+        self.last_signature = signature
+        self.last_frame_number = frame_number
+        self.inference_frames += 1
+        return True
@@ -1,3 +1,46 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import VideoDetection
+from .persistence import DetectionResultBuffer
+
+
+@override_settings(VIDEO_RESULT_FLUSH_SIZE=200, VIDEO_PROGRESS_INTERVAL=1.0)
+class DetectionFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='viewer')
+        self.client.force_login(self.user)
+        self.detection = VideoDetection.objects.create(
+            user=self.user, status='processing', storage_mode='frames', total_frames=1000
+        )
+        self.feed_url = reverse('detection_feed', args=[self.detection.pk])
+
+    def _feed(self, after_frame=-1):
+        return self.client.get(self.feed_url, {'after_frame': after_frame}).json()
+
+    @mock.patch('video_detection.persistence.time.monotonic')
+    def test_rows_below_flush_size_reach_feed_after_interval(self, monotonic):
+        monotonic.return_value = 100.0
+        buffer = DetectionResultBuffer(self.detection)
+        detections = [{'class': 'car', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}]
+        for frame_number in (0, 5, 10):
+            buffer.add(frame_number, frame_number / 30, detections)
+
+        monotonic.return_value = 100.5
+        buffer.flush_if_due()
+        self.assertEqual(self._feed()['frames'], [])
+
+        monotonic.return_value = 101.0
+        buffer.flush_if_due()
+        feed = self._feed()
+        self.assertEqual([frame['frame_number'] for frame in feed['frames']], [0, 5, 10])
+        self.assertEqual(feed['cursor'], 10)
+        self.assertEqual(feed['summary_delta'], {'car': 3})
+
+        buffer.add(15, 0.5, detections)
+        monotonic.return_value = 102.0
+        buffer.flush_if_due()
+        self.assertEqual([frame['frame_number'] for frame in self._feed(feed['cursor'])['frames']], [15])
@@ -0,0 +1,134 @@
+import numpy as np
+from django.conf import settings
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def greedy_match(ious, threshold):
+    """Pair rows with columns of an IoU matrix, best remaining pair first.
+
+    Returns [(row, col), ...] for pairs with IoU of at least threshold.
+    """
+    pairs = []
+    if ious.size:
+        used_rows = set()
+        used_cols = set()
+        for flat in np.argsort(-ious, axis=None):
+            row, col = divmod(int(flat), ious.shape[1])
+            if ious[row, col] < threshold:
+                break
+            if row in used_rows or col in used_cols:
+                continue
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+    return pairs
+
+
+class Track:
+    """One object followed across sampled frames"""
+
+    def __init__(self, track_id, class_id, class_name, frame_number, timestamp, bbox, confidence):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.class_name = class_name
+        self.first_frame = self.last_frame = frame_number
+        self.first_timestamp = self.last_timestamp = timestamp
+        self.bbox = bbox
+        self.max_confidence = confidence
+        self.hits = 1
+        self.missed = 0
+        self.trajectory = [[round(timestamp, 2)] + [round(float(v), 1) for v in bbox]]
+
+    def update(self, frame_number, timestamp, bbox, confidence, trajectory_interval):
+        self.last_frame = frame_number
+        self.last_timestamp = timestamp
+        self.bbox = bbox
+        self.max_confidence = max(self.max_confidence, confidence)
+        self.hits += 1
+        self.missed = 0
+        if timestamp - self.trajectory[-1][0] >= trajectory_interval:
+            self.trajectory.append([round(timestamp, 2)] + [round(float(v), 1) for v in bbox])
+
+    def close(self):
+        """Make sure the trajectory ends at the last position seen"""
+        if self.trajectory[-1][0] != round(self.last_timestamp, 2):
+            self.trajectory.append([round(self.last_timestamp, 2)] + [round(float(v), 1) for v in self.bbox])
+
+
+class IoUTracker:
+    """Greedy IoU tracker over FrameDetections.
+
+    Detections are matched to live tracks of the same class by highest IoU.
+    A track that goes unmatched for more than max_missed sampled frames is
+    closed; tracks seen fewer than min_hits times are dropped as flicker.
+    """
+
+    def __init__(self, iou_threshold=None, max_missed=None, min_hits=None, trajectory_interval=None):
+        self.iou_threshold = settings.VIDEO_TRACK_IOU if iou_threshold is None else iou_threshold
+        self.max_missed = settings.VIDEO_TRACK_MAX_MISSED if max_missed is None else max_missed
+        self.min_hits = settings.VIDEO_TRACK_MIN_HITS if min_hits is None else min_hits
+        self.trajectory_interval = (settings.VIDEO_TRACK_TRAJECTORY_INTERVAL
+                                    if trajectory_interval is None else trajectory_interval)
+        self.active = []
+        self.finished = []
+        self._next_id = 1
+
+    def update(self, frame_number, timestamp, detections):
+        """Feed the detections of one analyzed frame (in frame order)"""
+        track_boxes = np.array([t.bbox for t in self.active], dtype=np.float32).reshape(-1, 4)
+        track_classes = np.array([t.class_id for t in self.active], dtype=np.int32)
+        ious = iou_matrix(track_boxes, detections.xyxy)
+        ious[track_classes[:, None] != detections.cls[None, :]] = 0
+
+        matched_tracks = set()
+        matched_dets = set()
+        for ti, di in greedy_match(ious, self.iou_threshold):
+            matched_tracks.add(ti)
+            matched_dets.add(di)
+            self.active[ti].update(frame_number, timestamp, detections.xyxy[di],
+                                   float(detections.conf[di]), self.trajectory_interval)
+
+        still_active = []
+        for ti, track in enumerate(self.active):
+            if ti not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self._finish(track)
+                    continue
+            still_active.append(track)
+        self.active = still_active
+
+        for di in range(len(detections)):
+            if di in matched_dets:
+                continue
+            class_id = int(detections.cls[di])
+            self.active.append(Track(
+                self._next_id, class_id, detections.names[class_id], frame_number, timestamp,
+                detections.xyxy[di], float(detections.conf[di])
+            ))
+            self._next_id += 1
+
+    def _finish(self, track):
+        if track.hits >= self.min_hits:
+            track.close()
+            self.finished.append(track)
+
+    def finish(self):
+        """Close all live tracks and return every kept track"""
+        for track in self.active:
+            self._finish(track)
+        self.active = []
+        return self.finished
@@ -6,6 +6,11 @@ urlpatterns = [
     path('upload/', views.upload_video, name='upload_video'),
     path('webcam/', views.webcam_detection, name='webcam_detection'),
     path('process-frame/', views.process_webcam_frame, name='process_webcam_frame'),
+    path('process-frame-async/', views.process_webcam_frame_async, name='process_webcam_frame_async'),
     path('list/', views.detection_list, name='detection_list'),
     path('detail/<int:pk>/', views.detection_detail, name='detection_detail'),
+    path('detail/<int:pk>/results/', views.detection_results, name='detection_results'),
+    path('detail/<int:pk>/feed/', views.detection_feed, name='detection_feed'),
+    path('detail/<int:pk>/annotated.mp4', views.annotated_video, name='annotated_video'),
+    path('model-stats/', views.model_stats, name='model_stats'),
 ]
\ No newline at end of file
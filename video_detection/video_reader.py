@@ -0,0 +1,124 @@
+import queue
+import threading
+
+from django.conf import settings
+
+_END = object()
+
+
+def sample_stride(fps, stride_frames=None, stride_seconds=None):
+    """Frames between analyzed frames, from a frame count or a time interval"""
+    stride_seconds = settings.VIDEO_SAMPLE_SECONDS if stride_seconds is None else stride_seconds
+    if stride_seconds:
+        return max(1, int(round(fps * stride_seconds)))
+    return max(1, stride_frames or settings.VIDEO_SAMPLE_STRIDE)
+
+
+class VideoFrameReader:
+    """Read only the sampled frames of a video on a background thread.
+
+    Frames that won't be analyzed are skipped with grab() (demux only, no
+    decode), or with a seek when the stride is long enough to jump whole
+    GOPs. Decoded frames go into a bounded queue so decoding overlaps with
+    inference in the consuming thread. Iterating yields
+    (frame_number, timestamp, frame).
+
+    start_frame/end_frame restrict reading to [start_frame, end_frame): the
+    capture seeks to start_frame first. Frame numbers stay absolute, so a
+    start_frame on the stride grid samples the same frames as a full read.
+
+    With every_frame=True all frames are decoded and yielded (to render an
+    annotated copy in the same pass); the consumer picks the sampled ones
+    with is_sampled().
+    """
+
+    def __init__(self, path, stride_frames=None, stride_seconds=None, queue_size=None,
+                 seek_min_stride=None, transform=None, start_frame=0, end_frame=None, every_frame=False):
+        import cv2
+        self.cv2 = cv2
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0  # some containers report 0
+
+        self.stride = sample_stride(self.fps, stride_frames, stride_seconds)
+        seek_min_stride = settings.VIDEO_SEEK_MIN_STRIDE if seek_min_stride is None else seek_min_stride
+        self.every_frame = every_frame
+        self.use_seek = bool(seek_min_stride) and self.stride >= seek_min_stride and not every_frame
+        self.transform = transform
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+
+        self.frames_read = start_frame  # video position: frames grabbed or decoded so far
+        self._queue = queue.Queue(maxsize=queue_size or settings.VIDEO_DECODE_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = None
+
+    def _put(self, item):
+        """Block on a full queue, but give up if the consumer went away"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        cap = self.cap
+        limit = self.end_frame or self.total_frames
+        try:
+            frame_number = self.start_frame
+            if frame_number:
+                cap.set(self.cv2.CAP_PROP_POS_FRAMES, frame_number)
+            while not self._stop.is_set() and not (self.end_frame and frame_number >= self.end_frame):
+                if self.every_frame or self.is_sampled(frame_number):
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if self.transform:
+                        frame = self.transform(frame)
+                    self.frames_read = frame_number + 1
+                    if not self._put((frame_number, frame_number / self.fps, frame)):
+                        break
+                    if self.use_seek:
+                        frame_number += self.stride
+                        if limit and frame_number >= limit:
+                            self.frames_read = limit
+                            break
+                        cap.set(self.cv2.CAP_PROP_POS_FRAMES, frame_number)
+                        continue
+                elif not cap.grab():
+                    break
+                frame_number += 1
+                self.frames_read = frame_number
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(_END)
+
+    def is_sampled(self, frame_number):
+        return frame_number % self.stride == 0
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                yield item
+            if self._error:
+                raise self._error
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.cap.release()
@@ -1,13 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from .models import VideoDetection, DetectionResult
+from .models import VideoDetection, DetectionResult, DetectionArchive
 from .forms import VideoUploadForm
+from .archive import ArchivedFrames
+from .backpressure import FrameGate
+from .batching import batcher_stats
+from .executor import ExecutorBusy, executor_stats, get_executor
 from .yolo_service import YOLODetectionService
+from .model_registry import registry
+from .profiles import profile_choices
+from .websocket import WEBCAM_WS_PATH
+import asyncio
 import threading
 import json
+import os
+import re
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+RANGE_CHUNK_SIZE = 64 * 1024
 
 @login_required
 def video_detection_home(request):
@@ -34,7 +50,7 @@ def upload_video(request):
             video_detection.save()
             
             # Start processing in background
-            yolo_service = YOLODetectionService()
+            yolo_service = YOLODetectionService(profile=video_detection.profile)
             thread = threading.Thread(target=yolo_service.process_video_file, args=(video_detection.id,))
             thread.start()
             
@@ -48,7 +64,12 @@ def upload_video(request):
 @login_required
 def webcam_detection(request):
     """Real-time webcam detection page"""
-    return render(request, 'video_detection/webcam.html')
+    return render(request, 'video_detection/webcam.html', {
+        'websocket_path': WEBCAM_WS_PATH,
+        'frame_url': reverse('process_webcam_frame_async' if settings.WEBCAM_ASYNC_VIEW else 'process_webcam_frame'),
+        'profiles': profile_choices(),
+        'default_profile': settings.YOLO_DEFAULT_PROFILE
+    })
 
 @csrf_exempt
 @login_required
@@ -58,10 +79,25 @@ def process_webcam_frame(request):
         try:
             data = json.loads(request.body)
             frame_data = data.get('frame')
+            mode = data.get('mode', 'annotated')
+            if mode not in ('annotated', 'detections'):
+                return JsonResponse({'success': False, 'error': f'Unknown mode: {mode}'})
             
-            yolo_service = YOLODetectionService()
-            result = yolo_service.process_frame_base64(frame_data)
+            # Latest frame wins: at most one frame per client in flight, older ones dropped
+            client_key = f"{request.user.pk}:{request.session.session_key}:{data.get('client', '')}"
+            gate = FrameGate(client_key)
+            with gate.admit() as admitted:
+                if not admitted:
+                    return JsonResponse({
+                        'success': False,
+                        'dropped': True,
+                        'recommended_interval_ms': gate.recommended_interval_ms()
+                    })
+                # Cheap: the profile's model comes from the process-wide registry
+                yolo_service = YOLODetectionService(profile=data.get('profile'))
+                result = yolo_service.process_frame_base64(frame_data, mode=mode)
             
+            result['recommended_interval_ms'] = gate.recommended_interval_ms()
             return JsonResponse(result)
             
         except Exception as e:
@@ -72,6 +108,50 @@ def process_webcam_frame(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
+@csrf_exempt
+@login_required
+async def process_webcam_frame_async(request):
+    """Process single frame from webcam, without holding a worker during inference.
+
+    Same request and response as process_webcam_frame, for ASGI deployments
+    (WEBCAM_ASYNC_VIEW): decoding and inference run on the bounded webcam
+    executor while the event loop goes on serving other requests. A frame
+    that finds the executor full is dropped like a superseded one.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+    try:
+        data = json.loads(request.body)
+        frame_data = data.get('frame')
+        mode = data.get('mode', 'annotated')
+        if mode not in ('annotated', 'detections'):
+            return JsonResponse({'success': False, 'error': f'Unknown mode: {mode}'})
+
+        user = await request.auser()
+        client_key = f"{user.pk}:{request.session.session_key}:{data.get('client', '')}"
+        gate = FrameGate(client_key)
+        dropped = {'success': False, 'dropped': True}
+        try:
+            async with gate.admit_async() as admitted:
+                if not admitted:
+                    dropped['recommended_interval_ms'] = await asyncio.to_thread(gate.recommended_interval_ms)
+                    return JsonResponse(dropped)
+                yolo_service = YOLODetectionService(profile=data.get('profile'))
+                result = await get_executor().run(yolo_service.process_frame_base64, frame_data, mode)
+        except ExecutorBusy:
+            # Leaves the gate without recording a time, so the interval advice is not skewed
+            dropped['recommended_interval_ms'] = await asyncio.to_thread(gate.recommended_interval_ms)
+            return JsonResponse(dropped)
+
+        result['recommended_interval_ms'] = await asyncio.to_thread(gate.recommended_interval_ms)
+        return JsonResponse(result)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
 @login_required
 def detection_detail(request, pk):
     """View detection results"""
@@ -80,23 +160,196 @@ def detection_detail(request, pk):
         messages.error(request, 'You can only view your own detections.')
         return redirect('detection_list')
     
-    results = detection.results.all()
+    archive = DetectionArchive.objects.filter(video_detection=detection).first()
+    tracks = detection.tracks.all()
     
-    # Calculate statistics
-    total_detections = sum(len(result.detections) for result in results)
-    object_summary = {}
-    for result in results:
-        for detection in result.detections:
-            obj_class = detection.get('class', 'unknown')
-            object_summary[obj_class] = object_summary.get(obj_class, 0) + 1
+    # Detections of the analyzed frames, counted while processing in every storage mode;
+    # tracked objects are listed separately
+    object_summary = dict(sorted(detection.object_summary.items(), key=lambda item: -item[1]))
     
+    # Frame rows are loaded page by page from detection_results
     return render(request, 'video_detection/detail.html', {
         'detection': detection,
-        'results': results,
-        'total_detections': total_detections,
-        'object_summary': object_summary
+        'frame_count': archive.frame_count if archive is not None else detection.results.count(),
+        'archive': archive,
+        'tracks': tracks,
+        'total_detections': detection.total_detections,
+        'object_summary': object_summary,
+        'page_size': settings.VIDEO_RESULTS_PAGE_SIZE,
+        'feed_poll_interval': settings.VIDEO_FEED_POLL_INTERVAL
+    })
+
+@login_required
+def detection_results(request, pk):
+    """Paginated frame results as JSON.
+    
+    Query parameters: page, page_size, and an optional time window
+    start/end in seconds (start <= timestamp < end).
+    """
+    detection = get_object_or_404(VideoDetection, pk=pk)
+    if not request.user.is_superuser and detection.user != request.user:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        start = float(request.GET['start']) if request.GET.get('start') else None
+        end = float(request.GET['end']) if request.GET.get('end') else None
+        page_size = int(request.GET.get('page_size') or settings.VIDEO_RESULTS_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, end or page_size'}, status=400)
+    page_size = max(1, min(page_size, settings.VIDEO_RESULTS_MAX_PAGE_SIZE))
+    
+    archive = DetectionArchive.objects.filter(video_detection=detection).first()
+    if archive is not None:
+        frames = ArchivedFrames(archive.load().between(start, end))
+    else:
+        frames = detection.results.only('frame_number', 'timestamp', 'detections', 'inherited')
+        if start is not None:
+            frames = frames.filter(timestamp__gte=start)
+        if end is not None:
+            frames = frames.filter(timestamp__lt=end)
+    
+    paginator = Paginator(frames, page_size)
+    page = paginator.get_page(request.GET.get('page'))
+    return JsonResponse({
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'count': paginator.count,
+        'has_next': page.has_next(),
+        'has_previous': page.has_previous(),
+        'frames': [
+            {
+                'frame_number': result.frame_number,
+                'timestamp': result.timestamp,
+                'inherited': result.inherited,
+                'detections': result.detections
+            }
+            for result in page
+        ]
     })
 
+@login_required
+def detection_feed(request, pk):
+    """Frames stored since a cursor, for following a video while it is processed.
+
+    Query parameter: after_frame, the cursor returned by the previous call
+    (omit it to start from the beginning). At most VIDEO_FEED_MAX_FRAMES
+    frames are returned with the per-class counts they add (summary_delta),
+    so every poll costs the same however far processing has got. Per-frame
+    rows only exist in the 'frames' storage mode; other modes get progress
+    and status only.
+    """
+    detection = get_object_or_404(VideoDetection, pk=pk)
+    if not request.user.is_superuser and detection.user != request.user:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    try:
+        after_frame = int(request.GET.get('after_frame') or -1)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid after_frame'}, status=400)
+
+    # One more row than returned tells whether the client should ask again straight away
+    rows = list(
+        detection.results.filter(frame_number__gt=after_frame)
+        .order_by('frame_number')
+        .values_list('frame_number', 'timestamp', 'detections', 'inherited')[:settings.VIDEO_FEED_MAX_FRAMES + 1]
+    )
+    has_more = len(rows) > settings.VIDEO_FEED_MAX_FRAMES
+    rows = rows[:settings.VIDEO_FEED_MAX_FRAMES]
+
+    # Inherited rows repeat an analyzed frame's detections, so they are not counted again
+    summary_delta = {}
+    for _, _, detections, inherited in rows:
+        if inherited:
+            continue
+        for obj in detections:
+            obj_class = obj.get('class', 'unknown')
+            summary_delta[obj_class] = summary_delta.get(obj_class, 0) + 1
+
+    return JsonResponse({
+        'status': detection.status,
+        'processed_frames': detection.processed_frames,
+        'total_frames': detection.total_frames,
+        'cursor': rows[-1][0] if rows else after_frame,
+        'has_more': has_more,
+        'summary_delta': summary_delta,
+        'frames': [
+            {
+                'frame_number': frame_number,
+                'timestamp': timestamp,
+                'inherited': inherited,
+                'detections': detections
+            }
+            for frame_number, timestamp, detections, inherited in rows
+        ]
+    })
+
+def _ranged_file_response(request, path, content_type):
+    """Serve a file, honouring a single 'Range: bytes=start-end' request header.
+    
+    Other requests (no Range, multiple ranges) get the whole file, which
+    RFC 9110 allows. Unsatisfiable ranges get 416.
+    """
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    if not match or not any(match.groups()):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    def chunks():
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(RANGE_CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+    
+    response = StreamingHttpResponse(chunks(), status=206, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+@login_required
+def annotated_video(request, pk):
+    """Annotated MP4 of a detection, with Range support for seeking and resumed downloads"""
+    detection = get_object_or_404(VideoDetection, pk=pk)
+    if not request.user.is_superuser and detection.user != request.user:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    if not detection.annotated_video:
+        raise Http404('No annotated video for this detection')
+    
+    response = _ranged_file_response(request, detection.annotated_video.path, 'video/mp4')
+    if request.GET.get('download'):
+        response['Content-Disposition'] = f'attachment; filename="detection_{detection.pk}_annotated.mp4"'
+    return response
+
+@login_required
+def model_stats(request):
+    """YOLO model load/inference statistics for this worker (admin only)"""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    stats = registry.stats()
+    stats['batchers'] = batcher_stats()
+    stats['webcam_executor'] = executor_stats()
+    return JsonResponse(stats)
+
 @login_required
 def detection_list(request):
     """List all video detections"""
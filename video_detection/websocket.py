@@ -0,0 +1,154 @@
+import asyncio
+import json
+import time
+from importlib import import_module
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.http.cookie import parse_cookie
+from django.utils.crypto import constant_time_compare
+
+from .backpressure import recommended_interval_ms, update_average_ms
+from .executor import ExecutorBusy, get_executor
+from .yolo_service import YOLODetectionService
+
+WEBCAM_WS_PATH = '/video-detection/ws/webcam/'
+FRAME_ID_BYTES = 4  # big-endian frame id in front of each JPEG, echoed back as 'id'
+
+
+def _headers(scope):
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _same_origin(headers):
+    """Reject cross-site pages opening a socket with the user's cookies"""
+    origin = headers.get('origin')
+    if not origin:
+        return True  # not a browser
+    return urlsplit(origin).netloc == headers.get('host') or origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', [])
+
+
+def _session_user(cookie_header):
+    """Resolve the logged-in user from the Django session cookie, as AuthenticationMiddleware would"""
+    session_key = parse_cookie(cookie_header).get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user_id = session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    User = get_user_model()
+    user = User.objects.filter(pk=User._meta.pk.to_python(user_id), is_active=True).first()
+    if user is None:
+        return None
+    if not constant_time_compare(session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()):
+        return None  # password changed since login
+    return user
+
+
+def compact_detections(detections):
+    """[[class, confidence, x1, y1, x2, y2], ...] with whole-pixel boxes"""
+    boxes = detections.xyxy.round().astype(int).tolist()
+    return [
+        [detections.names[c], round(conf, 3)] + box
+        for c, conf, box in zip(detections.cls.tolist(), detections.conf.tolist(), boxes)
+    ]
+
+
+def _detect(service, image_bytes):
+    started = time.perf_counter()
+    _, detections, (width, height) = service.detect_jpeg(image_bytes, batched=settings.WEBCAM_BATCHING,
+                                                          full_frame=False)
+    return {
+        'w': width,
+        'h': height,
+        'd': compact_detections(detections),
+        'ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+async def webcam_websocket(scope, receive, send):
+    """Raw ASGI WebSocket handler for live webcam detection.
+
+    The client sends each frame as one binary message holding a 4-byte
+    big-endian frame id followed by the JPEG bytes, and gets back one
+    compact JSON text message per processed frame, whose 'id' names the
+    frame it answers (so latency is measured from that frame's send). The
+    session cookie is checked once at connect instead of on every frame,
+    and so is the detection profile (?profile=<name> on the socket URL).
+
+    Receiving and detection run concurrently with the latest frame winning:
+    a frame that arrives while another is being processed replaces any
+    frame still waiting, and the replaced frame is dropped, as is a frame
+    that finds the shared webcam executor full. Replies carry
+    'ri', the capture interval the client should use, and 'dr', the number
+    of frames dropped so far.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    headers = _headers(scope)
+    user = None
+    if _same_origin(headers):
+        user = await sync_to_async(_session_user)(headers.get('cookie', ''))
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    try:
+        service = YOLODetectionService(profile=query.get('profile', [None])[0])
+    except ValueError:
+        await send({'type': 'websocket.close', 'code': 4400})  # unknown profile
+        return
+    await send({'type': 'websocket.accept'})
+
+    state = {'latest': None, 'dropped': 0, 'closed': False}
+    frame_ready = asyncio.Event()
+
+    async def read_frames():
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            data = message.get('bytes')
+            if not data or len(data) <= FRAME_ID_BYTES:
+                continue  # text messages are reserved for control
+            if len(data) > settings.WEBCAM_WS_MAX_FRAME_BYTES + FRAME_ID_BYTES:
+                await send({'type': 'websocket.close', 'code': 1009})
+                break
+            if state['latest'] is not None:
+                state['dropped'] += 1
+            state['latest'] = (int.from_bytes(data[:FRAME_ID_BYTES], 'big'), data[FRAME_ID_BYTES:])
+            frame_ready.set()
+        state['closed'] = True
+        frame_ready.set()
+
+    reader = asyncio.ensure_future(read_frames())
+    executor = get_executor()
+    average_ms = None
+    warmed_up = False  # the first frame pays for model loading and is left out of the average
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if state['closed']:
+                return
+            (frame_id, image_bytes), state['latest'] = state['latest'], None
+            try:
+                reply = await executor.run(_detect, service, image_bytes)
+                if warmed_up:
+                    average_ms = update_average_ms(average_ms, reply['ms'])
+                warmed_up = True
+            except ExecutorBusy:
+                state['dropped'] += 1
+                reply = {'error': 'Server busy, frame dropped'}
+            except Exception as e:
+                reply = {'error': str(e)}
+            reply['id'] = frame_id
+            reply['ri'] = recommended_interval_ms(average_ms)
+            reply['dr'] = state['dropped']
+            await send({'type': 'websocket.send', 'text': json.dumps(reply, separators=(',', ':'))})
+    finally:
+        reader.cancel()
@@ -1,49 +1,83 @@
 import base64
 import json
-from .models import VideoDetection, DetectionResult
+import os
+import time
+from django.conf import settings
+from .archive import DetectionArchiveWriter
+from .batching import get_batcher
+from .detections import FrameDetections
+from .downscale import Downscaler, input_scale, jpeg_size, reduced_decode, rescale
+from .model_registry import registry
+from .models import VideoDetection
+from .parallel import CHUNKS_PER_WORKER, detect_chunks, frame_ranges
+from .persistence import DetectionResultBuffer, ProgressReporter, save_archive, save_summary, save_tracks
+from .profiles import get_profile
+from .rendering import AnnotatedVideoRenderer
+from .sampling import MotionSampler
+from .tracking import IoUTracker
+from .video_reader import VideoFrameReader, sample_stride
 
 class YOLODetectionService:
-    def __init__(self):
+    def __init__(self, model_variant=None, batch_size=None, profile=None):
         self.model = None
+        # Detection profile (YOLO_PROFILES): model, input size, threshold, classes, video stride
+        self.profile = get_profile(profile)
+        self.model_variant = model_variant or self.profile['model']
+        self.imgsz = self.profile['imgsz']
+        self.model_key = registry.key(self.model_variant, self.imgsz)
+        self.batch_size = batch_size or settings.YOLO_BATCH_SIZE
+        self.conf = self.profile['conf']
+        self.iou = settings.YOLO_IOU
+        self.classes = self.profile['classes']
+        self.stride = self.profile['stride']
+        self.downscaler = None
+        self.renderer = None
     
     def _load_model(self):
-        """Lazy load YOLO model to avoid import errors during migration"""
+        """Fetch the shared YOLO model (loaded once per process by the registry)"""
         if self.model is None:
             try:
                 import cv2
                 import numpy as np
-                from ultralytics import YOLO
-                self.model = YOLO('yolov8n.pt')  # nano version for speed
-                self.cv2 = cv2
-                self.np = np
             except ImportError as e:
                 raise ImportError(f"Required packages not installed: {e}")
+            self.model = registry.get(self.model_variant, self.imgsz)
+            self.classes = self._class_ids(self.model.names)
+            self.cv2 = cv2
+            self.np = np
         return self.model
+    
+    def _class_ids(self, names):
+        """The profile's class allow-list as model class ids (profiles may list names)"""
+        if not self.classes:
+            return None
+        ids = {name: class_id for class_id, name in names.items()}
+        try:
+            return [ids[c] if isinstance(c, str) else int(c) for c in self.classes]
+        except KeyError as e:
+            raise ValueError(f"Class {e} is not known to model {self.model_variant}")
+        
+    def detect_batch_arrays(self, frames):
+        """Detect objects in several frames with a single model call.
         
+        Returns one FrameDetections (NumPy arrays) per frame.
+        """
+        model = self._load_model()
+        started = time.perf_counter()
+        with registry.inference_lock(self.model_key):
+            results = model(
+                list(frames), imgsz=self.imgsz, conf=self.conf, iou=self.iou, classes=self.classes, verbose=False
+            )
+        registry.record_inference(self.model_key, time.perf_counter() - started, frames=len(results))
+        return FrameDetections.from_results(results, model.names)
+    
+    def detect_batch(self, frames):
+        """Detect objects in several frames; returns a list of detection dicts per frame"""
+        return [detections.to_dicts() for detections in self.detect_batch_arrays(frames)]
+    
     def detect_objects(self, frame):
         """Detect objects in a single frame"""
-        model = self._load_model()
-        results = model(frame)
-        detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = model.names[class_id]
-                    
-                    detection = {
-                        'class': class_name,
-                        'confidence': float(confidence),
-                        'bbox': [float(x1), float(y1), float(x2), float(y2)]
-                    }
-                    detections.append(detection)
-        
-        return detections
+        return self.detect_batch([frame])[0]
     
     def draw_detections(self, frame, detections):
         """Draw detection boxes on frame"""
@@ -64,46 +98,272 @@ class YOLODetectionService:
         
         return frame
     
+    def _detect_entries(self, batch):
+        """Run detection on a batch of (frame_number, timestamp, frame).
+        
+        Returns (frame_number, timestamp, FrameDetections) per entry, with
+        None instead of detections for entries whose frame is None (skipped
+        by the motion sampler). Boxes are in original video pixels even when
+        the reader downscaled the frames.
+        """
+        frames = [frame for _, _, frame in batch if frame is not None]
+        batch_detections = self.detect_batch_arrays(frames) if frames else []
+        if self.downscaler is not None:
+            batch_detections = [self.downscaler.restore(detections) for detections in batch_detections]
+        batch_detections = iter(batch_detections)
+        return [
+            (frame_number, timestamp, None if frame is None else next(batch_detections))
+            for frame_number, timestamp, frame in batch
+        ]
+    
+    def _store_entries(self, result_buffer, entries):
+        """Buffer the results of _detect_entries, in frame order.
+        
+        Entries without detections inherit those of the previous analyzed
+        frame. Analyzed frames also feed the tracker; per-frame rows are only
+        written when result_buffer is set (storage mode 'frames'), and
+        analyzed frames go to self.archive when it is set (storage mode
+        'columnar') and to self.renderer when an annotated video is wanted.
+        Without either writer, their per-class counts go to self.class_counts.
+        """
+        for frame_number, timestamp, detections in entries:
+            if detections is None:
+                if result_buffer is not None:
+                    result_buffer.add(frame_number, timestamp, self._last_detections, inherited=True)
+                continue
+            self.tracker.update(frame_number, timestamp, detections)
+            if self.archive is not None:
+                self.archive.add(frame_number, timestamp, detections)
+            if self.class_counts is not None:
+                for class_id in detections.cls.tolist():
+                    name = detections.names[class_id]
+                    self.class_counts[name] = self.class_counts.get(name, 0) + 1
+            if self.renderer is not None:
+                self.renderer.add_keyframe(frame_number, detections)
+            if result_buffer is not None:
+                self._last_detections = detections.to_dicts()
+                result_buffer.add(frame_number, timestamp, self._last_detections)
+        if result_buffer is not None:
+            result_buffer.flush_if_due()
+    
+    def _save_batch(self, result_buffer, batch):
+        """Run detection on a batch of (frame_number, timestamp, frame) and buffer the results"""
+        self._store_entries(result_buffer, self._detect_entries(batch))
+    
+    def _open_reader(self, path, start_frame=0, end_frame=None, every_frame=False):
+        """Frame reader for a video (or a frame range of it) and the MotionSampler, if adaptive sampling is on.
+        
+        With every_frame=True (annotated output) the reader yields all frames
+        at full size and _sampled_batches shrinks the sampled ones itself.
+        """
+        # Frames are shrunk to the model input size on the decode thread
+        self.downscaler = Downscaler(self.imgsz) if settings.YOLO_DOWNSCALE_INPUT else None
+        transform = None if every_frame else self.downscaler
+        if settings.VIDEO_ADAPTIVE_SAMPLING:
+            # Check frames at the minimum interval; YOLO only runs on scene changes
+            sampler = MotionSampler()
+            reader = VideoFrameReader(path, stride_frames=sampler.min_interval, stride_seconds=0,
+                                      start_frame=start_frame, end_frame=end_frame, transform=transform,
+                                      every_frame=every_frame)
+            return reader, sampler
+        reader = VideoFrameReader(path, stride_frames=self.stride, stride_seconds=0 if self.stride else None,
+                                  start_frame=start_frame, end_frame=end_frame, transform=transform,
+                                  every_frame=every_frame)
+        return reader, None
+    
+    def _report_stride(self, fps):
+        """Frames per result row: the profile's stride, or the VIDEO_SAMPLE_* sampling"""
+        return sample_stride(fps, self.stride, 0 if self.stride else None)
+    
+    def _sampled_batches(self, reader, sampler):
+        """Group the frames of a reader into inference batches.
+        
+        Yields (batch, frames_done): batch holds (frame_number, timestamp,
+        frame) entries, where frame is None for result rows that reuse the
+        previous analyzed frame's detections; frames_done is the video
+        position reached.
+        
+        When the reader yields every frame, all of them go to self.renderer
+        and a batch is cut short once VIDEO_RENDER_MAX_HELD frames wait for
+        its boxes.
+        """
+        # Regular result rows keep the fixed-stride timeline
+        report_stride = self._report_stride(reader.fps)
+        batch = []
+        pending_inference = 0
+        last_row_window = -1
+        renderer = self.renderer if reader.every_frame else None
+        for frame_number, timestamp, frame in reader:
+            if renderer is not None:
+                renderer.hold(frame_number, frame)
+                if not reader.is_sampled(frame_number):
+                    continue
+                if self.downscaler is not None:
+                    frame = self.downscaler(frame)
+            if sampler is None or sampler.should_infer(frame_number, frame):
+                batch.append((frame_number, timestamp, frame))
+                pending_inference += 1
+                last_row_window = frame_number // report_stride
+            elif frame_number // report_stride > last_row_window:
+                # At least one row per report_stride frames, reusing earlier detections
+                batch.append((frame_number, timestamp, None))
+                last_row_window = frame_number // report_stride
+            
+            # Several sampled frames per model call
+            if pending_inference >= self.batch_size or (
+                renderer is not None and pending_inference and len(renderer.held) >= renderer.max_held
+            ):
+                yield batch, frame_number + 1
+                batch = []
+                pending_inference = 0
+        if batch:
+            yield batch, reader.frames_read
+    
+    def detect_frame_range(self, path, start_frame, end_frame, progress=None):
+        """Detect objects in frames [start_frame, end_frame) of a video without touching the database.
+        
+        Used by the worker processes of chunked processing. Returns
+        (entries, frames_read, sampling) where entries are the
+        _detect_entries results in frame order, frames_read is the number of
+        frames covered and sampling holds the motion sampler's counters (or
+        None). With progress, progress(frames_done, entries) gets every
+        batch's entries as soon as they are detected and the returned
+        entries list is empty.
+        """
+        reader, sampler = self._open_reader(path, start_frame, end_frame)
+        entries = []
+        for batch, frames_done in self._sampled_batches(reader, sampler):
+            batch_entries = self._detect_entries(batch)
+            if progress:
+                progress(frames_done - start_frame, batch_entries)
+            else:
+                entries.extend(batch_entries)
+        sampling = None
+        if sampler is not None:
+            sampling = {'checked_frames': sampler.checked_frames, 'inference_frames': sampler.inference_frames}
+        return entries, reader.frames_read - start_frame, sampling
+    
+    def _process_sequential(self, reader, sampler, result_buffer, progress):
+        """Read, detect and store the whole video in this thread; returns (frames_read, sampling)"""
+        for batch, frames_done in self._sampled_batches(reader, sampler):
+            self._save_batch(result_buffer, batch)
+            progress.update(frames_done)
+        sampling = None
+        if sampler is not None:
+            sampling = {'checked_frames': sampler.checked_frames, 'inference_frames': sampler.inference_frames}
+        return reader.frames_read, sampling
+    
+    def _process_chunked(self, reader, workers, result_buffer, progress):
+        """Detect frame ranges in worker processes and store them in order; returns (frames_read, sampling)"""
+        reader.close()  # only used for the frame count; each worker seeks with its own capture
+        ranges = frame_ranges(reader.total_frames, workers * CHUNKS_PER_WORKER, reader.stride)
+        print(f"Processing {len(ranges)} chunks in {workers} worker processes")
+        frames_read = 0
+        sampling = None
+        for entries, chunk_frames, chunk_sampling in detect_chunks(
+            reader.path, ranges, self.profile['name'], self.model_variant, workers, on_progress=progress.update
+        ):
+            self._store_entries(result_buffer, entries)
+            frames_read += chunk_frames
+            if chunk_sampling is not None:
+                sampling = sampling or {'checked_frames': 0, 'inference_frames': 0}
+                for key, value in chunk_sampling.items():
+                    sampling[key] += value
+        return frames_read, sampling
+    
+    def _open_renderer(self, video_detection, fps):
+        """AnnotatedVideoRenderer writing to the annotated_video file of video_detection"""
+        self.annotated_name = f'annotated/video_{video_detection.id}.mp4'
+        path = video_detection.annotated_video.storage.path(self.annotated_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return AnnotatedVideoRenderer(path, fps)
+    
+    def _finish_annotated(self, video_detection):
+        """Finish the annotated MP4 and attach it; returns render stats.
+        
+        A failed render is reported in the stats instead of failing the
+        detection, whose results are already stored.
+        """
+        try:
+            stats = self.renderer.finish()
+        except Exception as e:
+            print(f"Annotated video rendering failed: {e}")
+            return {'error': str(e)}
+        video_detection.annotated_video.name = self.annotated_name
+        video_detection.save(update_fields=['annotated_video'])
+        print(f"Rendered {stats['frames']} annotated frames ({stats['codec']}) in {stats['seconds']}s")
+        return stats
+    
     def process_video_file(self, video_detection_id):
-        """Process uploaded video file"""
+        """Process uploaded video file.
+        
+        Long videos are split into frame ranges detected in parallel worker
+        processes when VIDEO_PARALLEL_WORKERS is above 1, unless an annotated
+        video is wanted: it is drawn on the frames this thread decodes.
+        """
         try:
             video_detection = VideoDetection.objects.get(id=video_detection_id)
             video_detection.status = 'processing'
+            video_detection.profile = self.profile['name']
+            video_detection.profile_settings = dict(self.profile, model=self.model_variant)
             video_detection.save()
             
             self._load_model()  # Ensure cv2 is loaded
             
-            cap = self.cv2.VideoCapture(video_detection.video_file.path)
-            total_frames = int(cap.get(self.cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(self.cv2.CAP_PROP_FPS)
+            # Sampled frames are decoded on a background thread while we run inference
+            render = video_detection.render_annotated
+            reader, sampler = self._open_reader(video_detection.video_file.path, every_frame=render)
             
-            video_detection.total_frames = total_frames
-            video_detection.save()
+            video_detection.total_frames = reader.total_frames
+            video_detection.save(update_fields=['total_frames'])
+            
+            result_buffer = None
+            if video_detection.storage_mode == 'frames':
+                result_buffer = DetectionResultBuffer(video_detection)
+            self.archive = DetectionArchiveWriter() if video_detection.storage_mode == 'columnar' else None
+            self.class_counts = {} if result_buffer is None and self.archive is None else None
+            progress = ProgressReporter(video_detection)
+            self.tracker = IoUTracker()
+            self.renderer = self._open_renderer(video_detection, reader.fps) if render else None
+            self._last_detections = []
+            workers = settings.VIDEO_PARALLEL_WORKERS
+            chunked = not render and workers > 1 and reader.total_frames >= settings.VIDEO_PARALLEL_MIN_FRAMES
+            if chunked:
+                frames_read, sampling = self._process_chunked(reader, workers, result_buffer, progress)
+            else:
+                frames_read, sampling = self._process_sequential(reader, sampler, result_buffer, progress)
             
-            frame_count = 0
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Process every 5th frame for speed
-                if frame_count % 5 == 0:
-                    detections = self.detect_objects(frame)
-                    timestamp = frame_count / fps
-                    
-                    # Save detection result
-                    DetectionResult.objects.create(
-                        video_detection=video_detection,
-                        frame_number=frame_count,
-                        timestamp=timestamp,
-                        detections=detections
-                    )
-                
-                frame_count += 1
-                video_detection.processed_frames = frame_count
-                video_detection.save()
-            
-            cap.release()
+            if result_buffer is not None:
+                result_buffer.flush()
+            if self.archive is not None:
+                archive = save_archive(video_detection, self.archive)
+                print(f"Archived {archive.detection_count} detections to {archive.file.name}")
+            if self.class_counts is not None:
+                save_summary(video_detection, self.class_counts)
+            track_count = save_tracks(video_detection, self.tracker.finish())
+            print(f"Stored {track_count} object tracks")
+            progress.update(frames_read, force=True)
+            
+            stats = {}
+            if chunked:
+                stats['parallel_workers'] = workers
+            if self.renderer is not None:
+                stats['annotated_video'] = self._finish_annotated(video_detection)
+            if sampling is not None:
+                report_stride = self._report_stride(reader.fps)
+                fixed_inference = -(-frames_read // report_stride)  # ceil
+                stats.update({
+                    'adaptive_sampling': True,
+                    'checked_frames': sampling['checked_frames'],
+                    'inference_frames': sampling['inference_frames'],
+                    'fixed_stride_inference_frames': fixed_inference,
+                    'inference_saved': fixed_inference - sampling['inference_frames'],
+                })
+                print(f"Adaptive sampling: {sampling['inference_frames']} inference frames "
+                      f"instead of {fixed_inference}")
+            if stats:
+                video_detection.processing_stats = stats
+                video_detection.save(update_fields=['processing_stats'])
             
             # Delete video file after processing
             if video_detection.video_file:
@@ -113,24 +373,79 @@ class YOLODetectionService:
             video_detection.save()
             
         except Exception as e:
+            if self.renderer is not None:
+                self.renderer.close()
             video_detection.status = 'failed'
             video_detection.save()
             print(f"Video processing failed: {str(e)}")
     
-    def process_frame_base64(self, frame_data):
-        """Process single frame from webcam (base64 encoded)"""
+    def detect_jpeg(self, image_bytes, batched=False, full_frame=True):
+        """Decode an encoded image (JPEG/PNG bytes) and detect objects in it.
+        
+        With batched=True the frame goes through the process-wide batching
+        server and shares a model call with other concurrent callers.
+        Images larger than the model input are shrunk before inference
+        (YOLO_DOWNSCALE_INPUT); with full_frame=False a large JPEG may also be
+        decoded at reduced resolution (YOLO_REDUCED_DECODE), so the returned
+        frame can be smaller than the image.
+        
+        Returns (frame, FrameDetections, (width, height)) with boxes in the
+        pixel coordinates of the original image of that size; raises
+        ValueError if the bytes cannot be decoded.
+        """
+        self._load_model()
+        cv2 = self.cv2
+        size = jpeg_size(image_bytes) if settings.YOLO_REDUCED_DECODE and not full_frame else None
+        factor, flag = reduced_decode(cv2, *size, self.imgsz) if size else (1, cv2.IMREAD_COLOR)
+        frame = cv2.imdecode(self.np.frombuffer(image_bytes, self.np.uint8), flag)
+        if frame is None:
+            raise ValueError('Could not decode image')
+        height, width = frame.shape[:2]
+        if size is None or (-(-size[0] // factor), -(-size[1] // factor)) != (width, height):
+            size = (width * factor, height * factor)  # not a JPEG, or rotated by its EXIF orientation
+        
+        model_frame = frame
+        if settings.YOLO_DOWNSCALE_INPUT:
+            scale = input_scale(width, height, self.imgsz)
+            if scale < 1:
+                model_frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                         interpolation=cv2.INTER_AREA)
+        if batched:
+            detections = get_batcher(self.profile['name']).detect(model_frame)
+        else:
+            detections = self.detect_batch_arrays([model_frame])[0]
+        detections = rescale(detections, size[0] / model_frame.shape[1], size[1] / model_frame.shape[0])
+        return frame, detections, size
+    
+    def process_frame_base64(self, frame_data, mode='annotated'):
+        """Process single frame from webcam (base64 encoded).
+        
+        mode 'annotated' returns the frame with boxes drawn as a base64 JPEG;
+        mode 'detections' skips drawing and re-encoding and returns boxes
+        normalized to the frame size for the browser to draw.
+        """
         try:
+            started = time.perf_counter()
             self._load_model()  # Ensure cv2 and np are loaded
             
-            # Decode base64 image
+            # Decode base64 image and detect objects
             img_data = base64.b64decode(frame_data.split(',')[1])
-            nparr = self.np.frombuffer(img_data, self.np.uint8)
-            frame = self.cv2.imdecode(nparr, self.cv2.IMREAD_COLOR)
+            frame, frame_detections, (width, height) = self.detect_jpeg(
+                img_data, batched=settings.WEBCAM_BATCHING, full_frame=mode == 'annotated'
+            )
             
-            # Detect objects
-            detections = self.detect_objects(frame)
+            if mode == 'detections':
+                return {
+                    'success': True,
+                    'mode': mode,
+                    'width': width,
+                    'height': height,
+                    'detections': frame_detections.to_normalized(width, height),
+                    'server_ms': round((time.perf_counter() - started) * 1000, 1)
+                }
             
             # Draw detections
+            detections = frame_detections.to_dicts()
             result_frame = self.draw_detections(frame.copy(), detections)
             
             # Encode result back to base64
@@ -139,8 +454,10 @@ class YOLODetectionService:
             
             return {
                 'success': True,
+                'mode': 'annotated',
                 'result_image': f"data:image/jpeg;base64,{result_base64}",
-                'detections': detections
+                'detections': detections,
+                'server_ms': round((time.perf_counter() - started) * 1000, 1)
             }
             
         except Exception as e: